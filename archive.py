@@ -0,0 +1,250 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+from prompt_budget import split_requirements
+
+# Column weights for bm25() when looking for the closest letter:
+# company_name, job_title, industry, job_description, body
+CLOSEST_WEIGHTS = (2.0, 4.0, 1.0, 1.0, 0.5)
+
+# Requirement phrases of a new posting used to look for the closest letter
+CLOSEST_REQUIREMENTS = 8
+
+_TERM_PATTERN = re.compile(r"\w+")
+
+
+def template_hash(template):
+    """Hash a template so letters written from the same template can be found again"""
+    return hashlib.sha256((template or '').encode('utf-8')).hexdigest()
+
+
+def _fts_terms(text):
+    """Quote every word so user text can't inject FTS5 query syntax"""
+    return [f'"{term}"' for term in _TERM_PATTERN.findall(text.lower())]
+
+
+class LetterArchive:
+    """
+    SQLite archive of generated letters with full-text search.
+
+    Letter bodies are stored zlib-compressed. An FTS5 index without stored
+    content covers the company, title, industry, job description and letter
+    text, so search stays fast while the archive keeps only one copy of each letter.
+    """
+
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS letters ("
+            " id INTEGER PRIMARY KEY,"
+            " created_at REAL NOT NULL,"
+            " company_name TEXT NOT NULL,"
+            " job_title TEXT NOT NULL,"
+            " job_details TEXT NOT NULL,"
+            " template_hash TEXT NOT NULL,"
+            " model TEXT,"
+            " timings TEXT,"
+            " body BLOB NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS letters_fts USING fts5("
+            " company_name, job_title, industry, job_description, body, content='')"
+        )
+        self._conn.commit()
+
+    def add(self, cover_letter, job_details, template=None, model_name=None, timings=None):
+        """
+        Store a generated letter together with the inputs that produced it.
+
+        Args:
+            cover_letter (str): The letter text
+            job_details (dict): Dictionary containing job details like company, role, etc.
+            template (str): The template the letter was generated from, or None
+            model_name (str): The model that wrote the letter
+            timings (dict): Optional timings, e.g. from stream_cover_letter()
+
+        Returns:
+            int: The id of the archived letter
+        """
+        company_name = job_details.get('company_name', '')
+        job_title = job_details.get('job_title', '')
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO letters (created_at, company_name, job_title, job_details, template_hash, model, timings, body)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), company_name, job_title, json.dumps(job_details), template_hash(template),
+                 model_name, json.dumps(timings or {}), zlib.compress(cover_letter.encode('utf-8'))),
+            )
+            letter_id = cursor.lastrowid
+            self._conn.execute(
+                "INSERT INTO letters_fts (rowid, company_name, job_title, industry, job_description, body)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (letter_id, company_name, job_title, job_details.get('industry', ''),
+                 job_details.get('job_description', ''), cover_letter),
+            )
+            self._conn.commit()
+        return letter_id
+
+    def _record(self, row, with_body=True):
+        letter_id, created_at, company_name, job_title, job_details, hash_, model, timings, body = row
+        record = {
+            'id': letter_id,
+            'created_at': created_at,
+            'company_name': company_name,
+            'job_title': job_title,
+            'job_details': json.loads(job_details),
+            'template_hash': hash_,
+            'model': model,
+            'timings': json.loads(timings or '{}'),
+        }
+        if with_body:
+            record['cover_letter'] = zlib.decompress(body).decode('utf-8')
+        return record
+
+    def get(self, letter_id):
+        """Return the archived letter with this id, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM letters WHERE id = ?", (letter_id,)).fetchone()
+        return self._record(row) if row is not None else None
+
+    def postings(self, after_id=0):
+        """Yield (id, job_details) for every letter with an id above after_id, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, job_details FROM letters WHERE id > ? ORDER BY id", (after_id,)
+            ).fetchall()
+        for letter_id, job_details in rows:
+            yield letter_id, json.loads(job_details)
+
+    def search(self, keywords='', company=None, job_title=None, limit=10):
+        """
+        Find archived letters by keyword, company or role, best match first.
+
+        Args:
+            keywords (str): Words that must all appear in the posting or the letter
+            company (str): Words that must appear in the company name
+            job_title (str): Words that must appear in the job title
+            limit (int): Maximum number of letters to return
+
+        Returns:
+            list: Letter records without the letter text (see get())
+        """
+        clauses = []
+        for column, text in (('company_name', company), ('job_title', job_title)):
+            terms = _fts_terms(text or '')
+            if terms:
+                clauses.append(f"{column} : ({' '.join(terms)})")
+        clauses.extend(_fts_terms(keywords))
+
+        with self._lock:
+            if clauses:
+                rows = self._conn.execute(
+                    "SELECT letters.* FROM letters_fts JOIN letters ON letters.id = letters_fts.rowid"
+                    " WHERE letters_fts MATCH ? ORDER BY rank LIMIT ?",
+                    (" AND ".join(clauses), limit),
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM letters ORDER BY created_at DESC LIMIT ?", (limit,)
+                ).fetchall()
+        return [self._record(row, with_body=False) for row in rows]
+
+    def closest(self, job_details, template=None):
+        """
+        Find the archived letter written for the posting most similar to job_details.
+
+        Only letters written from the same template are considered, since a
+        letter for a different template would not keep its layout.
+
+        Args:
+            job_details (dict): Dictionary containing job details like company, role, etc.
+            template (str): The template the new letter will use, or None
+
+        Returns:
+            dict: The closest letter record including its text, or None if nothing matches
+        """
+        text = " ".join([
+            job_details.get('job_title', ''),
+            job_details.get('industry', ''),
+            *split_requirements(job_details.get('job_description', ''))[:CLOSEST_REQUIREMENTS],
+        ])
+        terms = sorted(set(_fts_terms(text)))
+        if not terms:
+            return None
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT letters.* FROM letters_fts JOIN letters ON letters.id = letters_fts.rowid"
+                f" WHERE letters_fts MATCH ? AND letters.template_hash = ?"
+                f" ORDER BY bm25(letters_fts, {', '.join(map(str, CLOSEST_WEIGHTS))}) LIMIT 1",
+                (" OR ".join(terms), template_hash(template)),
+            ).fetchone()
+        return self._record(row) if row is not None else None
+
+    def stats(self):
+        """Return the number of archived letters and the archive size on disk"""
+        with self._lock:
+            count = self._conn.execute("SELECT COUNT(*) FROM letters").fetchone()[0]
+        return {"letters": count, "bytes": os.path.getsize(self.path)}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_letter_archive = None
+_letter_archive_lock = threading.Lock()
+
+
+def get_letter_archive(config):
+    """Return the process-wide letter archive, creating it on first use"""
+    global _letter_archive
+    with _letter_archive_lock:
+        if _letter_archive is None:
+            _letter_archive = LetterArchive(config["ARCHIVE_PATH"])
+        return _letter_archive
+
+
+def main(argv=None):
+    from config import load_config
+
+    parser = argparse.ArgumentParser(description="Search the archive of generated cover letters.")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    search_parser = subcommands.add_parser("search", help="List archived letters matching keywords")
+    search_parser.add_argument("keywords", nargs="*", help="Words that must appear in the posting or letter")
+    search_parser.add_argument("--company", default=None, help="Words that must appear in the company name")
+    search_parser.add_argument("--title", default=None, help="Words that must appear in the job title")
+    search_parser.add_argument("--limit", type=int, default=10, help="Maximum number of letters to list")
+    show_parser = subcommands.add_parser("show", help="Print one archived letter")
+    show_parser.add_argument("id", type=int, help="Id of the letter, as listed by search")
+    args = parser.parse_args(argv)
+
+    archive = get_letter_archive(load_config())
+    if args.command == "show":
+        record = archive.get(args.id)
+        if record is None:
+            print(f"No archived letter with id {args.id}")
+            return 1
+        print(record['cover_letter'])
+        return 0
+
+    for record in archive.search(" ".join(args.keywords), args.company, args.title, args.limit):
+        created = time.strftime("%Y-%m-%d", time.localtime(record['created_at']))
+        print(f"{record['id']:6d}  {created}  {record['company_name']} - {record['job_title']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,164 @@
+import json
+import random
+import re
+import threading
+import time
+import types
+
+
+class ModelBackend:
+    """
+    Interface every model backend implements.
+
+    Responses only need a .text attribute; streamed responses are iterables of
+    chunks that each have a .text attribute, like the Gemini SDK's.
+    """
+
+    # Recorded with every call in the usage ledger
+    name = "model"
+
+    def generate(self, prompt, model_name, generation_config=None, stream=False, timeout=None):
+        raise NotImplementedError
+
+    def count_tokens(self, prompt, model_name):
+        raise NotImplementedError
+
+    def warm_up(self, model_name):
+        """Prepare a model ahead of the first request (optional)"""
+
+
+class GeminiBackend(ModelBackend):
+    """Backend that sends prompts to Gemini through pooled GenerativeModel instances"""
+
+    name = "gemini"
+
+    def __init__(self, get_model):
+        self.get_model = get_model
+
+    def generate(self, prompt, model_name, generation_config=None, stream=False, timeout=None):
+        # The SDK abandons the HTTP request itself once the timeout passes
+        request_options = {"timeout": timeout} if timeout else None
+        return self.get_model(model_name, generation_config).generate_content(
+            prompt, stream=stream, request_options=request_options)
+
+    def count_tokens(self, prompt, model_name):
+        return self.get_model(model_name).count_tokens(prompt).total_tokens
+
+    def warm_up(self, model_name):
+        # A token-count request opens the connection without paying for generation
+        self.get_model(model_name).count_tokens("warm-up")
+
+
+class FakeResponse:
+    """Stand-in for a Gemini response or stream chunk"""
+
+    def __init__(self, text, candidate_count=1, usage=None):
+        self.text = text
+        # Like the SDK, complete responses and the last stream chunk report (prompt, output) token usage
+        self.usage_metadata = None
+        if usage is not None:
+            prompt_tokens, output_tokens = usage
+            self.usage_metadata = types.SimpleNamespace(
+                prompt_token_count=prompt_tokens,
+                candidates_token_count=output_tokens,
+                total_token_count=prompt_tokens + output_tokens,
+            )
+        # Mirror the SDK's response.candidates[i].content.parts[j].text layout
+        self.candidates = [
+            types.SimpleNamespace(content=types.SimpleNamespace(parts=[types.SimpleNamespace(text=text)]))
+            for _ in range(candidate_count)
+        ]
+
+
+class FakeBackendError(Exception):
+    """Simulated transient server error; .code makes the rate limiter retry it"""
+
+    def __init__(self, message, code=503):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeBackend(ModelBackend):
+    """
+    Local backend with configurable latency, jitter, failure rate and response size.
+
+    It never touches the network, so benchmarks and offline runs are reproducible.
+
+    Args:
+        latency (float): Mean seconds per request
+        jitter (float): Maximum seconds added to or removed from the latency
+        failure_rate (float): Probability (0-1) that a request fails with FakeBackendError
+        response_words (int): Number of words in a generated letter
+        seed (int): Seed for the random generator, for reproducible runs
+        tail_rate (float): Probability (0-1) that a request is a straggler taking tail_latency seconds
+        tail_latency (float): Seconds a straggling request takes
+    """
+
+    name = "fake"
+
+    FILLER = ("I am excited to bring my experience and enthusiasm to this role and to contribute "
+              "to the continued success of the team ").split()
+
+    def __init__(self, latency=0.5, jitter=0.1, failure_rate=0.0, response_words=500, seed=None,
+                 tail_rate=0.0, tail_latency=5.0):
+        self.latency = latency
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.response_words = response_words
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _delay(self):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + self._random.uniform(-self.jitter, self.jitter)
+            if self._random.random() < self.tail_rate:
+                delay = self.tail_latency
+            failed = self._random.random() < self.failure_rate
+        return max(delay, 0.0), failed
+
+    def _answer(self, prompt, generation_config):
+        generation_config = generation_config or {}
+        wants_json = generation_config.get("response_mime_type") == "application/json"
+        # Only the industry suggestion asks for this schema; prompt text can mention industries anywhere
+        schema = generation_config.get("response_schema") or {}
+        if "industries" in schema.get("properties", {}):
+            return json.dumps({"industries": ["Technology", "Finance", "Healthcare"]})
+        if wants_json:
+            # Answer every numbered item in the prompt, e.g. template slots
+            numbers = re.findall(r"^\s*(\d+)\. ", prompt, re.MULTILINE)
+            return json.dumps({number: f"Sample text for part {number}." for number in numbers})
+
+        words = [self.FILLER[i % len(self.FILLER)] for i in range(self.response_words)]
+        # Paragraphs of about 100 words, like a real letter
+        paragraphs = [" ".join(words[i:i + 100]) for i in range(0, len(words), 100)]
+        return "Dear Hiring Manager,\n\n" + "\n\n".join(paragraphs) + "\n\nSincerely,\nApplicant"
+
+    def generate(self, prompt, model_name, generation_config=None, stream=False, timeout=None):
+        delay, failed = self._delay()
+        if failed:
+            time.sleep(delay / 2)
+            raise FakeBackendError("Simulated server error")
+
+        text = self._answer(prompt, generation_config)
+        candidate_count = (generation_config or {}).get("candidate_count", 1)
+        usage = (self.count_tokens(prompt, model_name), self.count_tokens(text, model_name) * candidate_count)
+        if not stream:
+            time.sleep(delay)
+            return FakeResponse(text, candidate_count, usage)
+
+        def chunks(pieces=8):
+            size = max(1, len(text) // pieces)
+            for start in range(0, len(text), size):
+                time.sleep(delay / pieces)
+                yield FakeResponse(text[start:start + size])
+            # The final chunk carries the usage of the whole answer
+            yield FakeResponse("", usage=usage)
+
+        return chunks()
+
+    def count_tokens(self, prompt, model_name):
+        return max(1, len(prompt) // 4)
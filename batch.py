@@ -0,0 +1,424 @@
+import argparse
+import csv
+import json
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+
+from cache import get_response_cache
+from generate_CL import config, generate_cover_letter, stream_cover_letter, stream_to_file
+from hedging import get_hedged_caller
+from journal import GENERATED, RENDERED, BatchJournal, job_key
+from metrics import metrics
+from model_pool import warm_up
+from rate_limiter import get_rate_limiter
+from template import load_template_from_file
+from usage import BudgetExceeded, get_usage_ledger
+
+# Fields that describe the applicant rather than the job posting
+PROFILE_FIELDS = ['your_name', 'email', 'phone', 'city', 'country']
+
+
+def load_job_records(jobs_path):
+    """
+    Load job postings from a CSV or JSONL file.
+
+    Args:
+        jobs_path (str): Path to a .csv file with a header row or a .jsonl file with one object per line
+
+    Returns:
+        list: List of job_details dictionaries
+    """
+    records = []
+    if jobs_path.lower().endswith('.csv'):
+        with open(jobs_path, 'r', newline='') as file:
+            for row in csv.DictReader(file):
+                records.append({key.strip(): (value or '').strip() for key, value in row.items() if key})
+    else:
+        with open(jobs_path, 'r') as file:
+            for line in file:
+                if line.strip():
+                    records.append(json.loads(line))
+    return records
+
+
+def load_profile(profile_path):
+    """
+    Load the shared applicant profile from a JSON file.
+
+    Args:
+        profile_path (str): Path to a JSON file with your_name, email, phone, city and country
+
+    Returns:
+        dict: The applicant profile
+    """
+    with open(profile_path, 'r') as file:
+        profile = json.load(file)
+
+    missing = [field for field in PROFILE_FIELDS if not profile.get(field)]
+    if missing:
+        raise ValueError(f"Profile is missing required fields: {', '.join(missing)}")
+
+    return profile
+
+
+def output_basename(index, job_details):
+    """Build a filesystem-safe base filename for one job posting"""
+    label = f"{job_details.get('company_name', '')}_{job_details.get('job_title', '')}"
+    label = re.sub(r'[^A-Za-z0-9]+', '_', label).strip('_') or 'cover_letter'
+    return f"{index:04d}_{label}"
+
+
+def stream_letter_to_file(template, job_details, txt_filename, use_cache=True, refresh_cache=False):
+    """
+    Stream one cover letter into a text file as it is generated.
+
+    Returns:
+        tuple: The full cover letter text and its timings dictionary
+    """
+    timings = {}
+    chunks = stream_cover_letter(template, job_details, timings, use_cache, refresh_cache)
+    cover_letter = "".join(stream_to_file(chunks, txt_filename))
+    return cover_letter, timings
+
+
+def adapt_leader_letter(leader_future, leader_details, job_details, template=None, use_cache=True):
+    """Wait for the letter of an earlier near-duplicate posting and adapt it to this one"""
+    from posting_index import adapt_letter
+
+    result = leader_future.result()
+    # Streamed letters come back together with their timings
+    cover_letter = result[0] if isinstance(result, tuple) else result
+    return adapt_letter({'cover_letter': cover_letter, 'job_details': leader_details}, job_details,
+                        template, use_cache)
+
+
+def run_batch(jobs, profile, template=None, output_dir="output", formats=("txt", "pdf"), max_in_flight=4,
+              use_cache=True, refresh_cache=False, stream=False, pdf_workers=0, merged_pdf=None, dedupe=False,
+              journal_dir=None, merged_pdf_split=0):
+    """
+    Generate cover letters for many job postings concurrently.
+
+    Args:
+        jobs (iterable): job_details dictionaries (company_name, job_title, job_description, industry);
+            may be a generator, e.g. from ingest.ingest_directory()
+        profile (dict): Applicant fields shared by every letter
+        template (str): The cover letter template, or None to let Gemini write the letter freely
+        output_dir (str): Directory the .txt/.pdf files are written to
+        formats (tuple): Output formats to write, any of "txt" and "pdf"
+        max_in_flight (int): Maximum number of concurrent Gemini requests; the shared rate limiter
+            may run fewer while the API is throttling
+        use_cache (bool): Reuse cached responses for prompts that were already generated
+        refresh_cache (bool): Ignore cached responses and overwrite them with fresh ones
+        stream (bool): Stream each letter into its .txt file while it is generated
+        pdf_workers (int): Render PDFs in this many worker processes instead of in this process (0 to disable)
+        merged_pdf (str): Also append every letter to this single PDF, in completion order
+        merged_pdf_split (int): Split the merged PDF into numbered files of this many letters,
+            which bounds its memory use (0 for one file)
+        dedupe (bool): Archive every letter and adapt an earlier letter for postings that nearly
+            repeat an archived posting or an earlier posting of the batch
+        journal_dir (str): Keep a crash-safe journal here; a rerun with the same journal skips
+            rendered postings and renders generated ones without calling the model again.
+            Postings whose output files are missing or were written in other formats are
+            rendered again from the stored letter; refresh_cache ignores the journal
+
+    Returns:
+        dict: Summary with the number of letters written, failures and throughput
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if "pdf" in formats:
+        # reportlab is only imported when PDFs are requested
+        from pdf_export import create_pdf_pool, export_to_pdf, render_pdf_item
+
+    # Requests beyond max_in_flight never run, so throttling backs off from there rather than from MAX_CONCURRENCY
+    get_rate_limiter(config).concurrency.seed(max_in_flight)
+
+    start = time.perf_counter()
+    completed = 0
+    failures = []
+    first_token_times = []
+    stream = stream and "txt" in formats
+    pdf_pool = create_pdf_pool(pdf_workers) if "pdf" in formats and pdf_workers else None
+    pdf_futures = {}
+    merged_writer = None
+    if merged_pdf:
+        from pdf_export import MergedPdfWriter
+        merged_writer = MergedPdfWriter(merged_pdf, title="Cover letters", author=profile.get('your_name', ''),
+                                        letters_per_file=merged_pdf_split)
+
+    # Posting fields take precedence over the shared profile
+    all_details = ({**profile, **job} for job in jobs)
+    archive = posting_index = None
+    archived, leaders = {}, {}
+    if dedupe:
+        from archive import get_letter_archive
+        from posting_index import adapt_letter, get_posting_index, plan_batch_reuse
+        # Duplicates are planned across the whole batch, so the postings are read up front
+        all_details = list(all_details)
+        archive = get_letter_archive(config)
+        posting_index = get_posting_index(config)
+        archived, leaders = plan_batch_reuse(all_details, config, template)
+        if archived or leaders:
+            print(f"Adapting earlier letters for {len(archived) + len(leaders)} near-duplicate postings")
+
+    journal = BatchJournal(journal_dir) if journal_dir else None
+    reused = 0
+    resumed = 0
+    budget_exceeded = False
+
+    def is_rendered(key, name):
+        """True if an earlier run wrote every requested output file of a posting"""
+        base_filename = os.path.join(output_dir, name)
+        return (set(formats) <= set(journal.formats(key))
+                and all(os.path.exists(f"{base_filename}.{file_format}") for file_format in formats))
+
+    def collect(future, index, job_details, name, streamed, adapted, key, resume_state):
+        nonlocal completed, reused, budget_exceeded
+        base_filename = os.path.join(output_dir, name)
+        # Letters rendered by an earlier run were archived then; re-rendering them must not add them twice
+        archived_before = journal is not None and journal.state(key) == RENDERED
+        try:
+            if streamed:
+                # The text file was already written while the letter streamed in
+                cover_letter, timings = future.result()
+                first_token_times.append(timings.get('time_to_first_token', 0.0))
+            else:
+                cover_letter = future.result()
+            if journal is not None and resume_state is None:
+                journal.mark_generated(key, cover_letter)
+
+            if resume_state == RENDERED:
+                # Only the merged PDF is rebuilt for postings finished in an earlier run
+                if merged_writer is not None:
+                    merged_writer.add_letter(cover_letter, job_details)
+                completed += 1
+                return
+
+            if "txt" in formats and not streamed:
+                with metrics.timer("write_text"), open(f"{base_filename}.txt", 'w') as file:
+                    file.write(cover_letter)
+
+            if adapted:
+                reused += 1
+            if archive is not None and not archived_before:
+                letter_id = archive.add(cover_letter, job_details, template, config["DEFAULT_MODEL"])
+                posting_index.add(letter_id, job_details)
+
+            if merged_writer is not None:
+                merged_writer.add_letter(cover_letter, job_details)
+
+            if pdf_pool is not None:
+                # Layout is CPU-bound, so hand it to the process pool and keep collecting letters
+                pdf_future = pdf_pool.submit(render_pdf_item, (cover_letter, job_details, f"{base_filename}.pdf"))
+                pdf_futures[pdf_future] = (index, key)
+                return
+
+            if "pdf" in formats:
+                export_to_pdf(cover_letter, job_details, f"{base_filename}.pdf")
+
+            if journal is not None:
+                journal.mark_rendered(key, formats)
+            completed += 1
+        except Exception as e:
+            print(f"Failed to generate letter for {job_details.get('company_name', '')}: {e}")
+            failures.append((index, str(e)))
+            if isinstance(e, BudgetExceeded):
+                budget_exceeded = True
+
+    # Postings may come from a generator, so only a bounded window of them is submitted at a time
+    max_pending = max_in_flight * 4
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        futures = {}
+        leader_futures = {}
+        leader_positions = set(leaders.values())
+        occurrences = {}
+        for position, job_details in enumerate(all_details):
+            if budget_exceeded:
+                # Stop submitting; letters already in flight still finish within the budget
+                print("Run budget reached, not starting any more letters")
+                break
+            if len(futures) >= max_pending:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                # Write each letter out as soon as its request finishes
+                for future in done:
+                    collect(future, *futures.pop(future))
+
+            index = position + 1
+            streamed = False
+            key = resume_state = None
+            name = output_basename(index, job_details)
+            if journal is not None:
+                key = job_key(job_details, template)
+                occurrence = occurrences.get(key, 0)
+                occurrences[key] = occurrence + 1
+                if occurrence:
+                    # Identical postings in one batch each need their own entry and output file
+                    key = job_key(job_details, template, occurrence)
+                # Pending postings were in flight when the last run stopped, so they are generated again;
+                # refreshing regenerates everything
+                state = journal.state(key)
+                resume_state = state if state in (GENERATED, RENDERED) and not refresh_cache else None
+                # Input order can change between runs, e.g. for ingested directories, so names are kept
+                name = journal.name(key) or name
+                if resume_state == RENDERED and not is_rendered(key, name):
+                    # Other formats were requested or files were removed: render again from the stored letter
+                    resume_state = GENERATED
+
+            if resume_state == RENDERED and merged_writer is None and position not in leader_positions:
+                completed += 1
+                resumed += 1
+                continue
+            if resume_state in (GENERATED, RENDERED):
+                # Already paid for: load the stored letter instead of calling the model
+                future = Future()
+                future.set_result(journal.letter(key))
+                resumed += 1
+            elif position in archived:
+                future = executor.submit(adapt_letter, archived[position], job_details, template, use_cache)
+            elif position in leaders:
+                # The leader was submitted first, so it is already running when this task waits for it
+                leader_future, leader_details = leader_futures[leaders[position]]
+                future = executor.submit(adapt_leader_letter, leader_future, leader_details,
+                                         job_details, template, use_cache)
+            elif stream:
+                txt_filename = os.path.join(output_dir, name) + ".txt"
+                future = executor.submit(stream_letter_to_file, template, job_details, txt_filename,
+                                         use_cache, refresh_cache)
+                streamed = True
+            else:
+                future = executor.submit(generate_cover_letter, template, job_details, use_cache, refresh_cache)
+            if journal is not None and resume_state is None:
+                journal.mark_pending(key, name)
+            futures[future] = (index, job_details, name, streamed, position in archived or position in leaders,
+                               key, resume_state)
+            if position in leader_positions:
+                leader_futures[position] = (future, job_details)
+
+        for future in as_completed(futures):
+            collect(future, *futures[future])
+
+    if merged_writer is not None:
+        merged_writer.close()
+
+    if posting_index is not None:
+        posting_index.save()
+
+    if pdf_pool is not None:
+        for pdf_future in as_completed(pdf_futures):
+            pdf_filename, error = pdf_future.result()
+            index, key = pdf_futures[pdf_future]
+            if error:
+                print(f"Failed to create PDF {pdf_filename}: {error}")
+                failures.append((index, error))
+            else:
+                if journal is not None:
+                    journal.mark_rendered(key, formats)
+                completed += 1
+        pdf_pool.shutdown()
+
+    if journal is not None:
+        journal.close()
+
+    elapsed = time.perf_counter() - start
+    letters_per_minute = completed / elapsed * 60 if elapsed > 0 else 0.0
+
+    return {
+        "completed": completed,
+        "failed": len(failures),
+        "failures": failures,
+        "reused": reused,
+        "resumed": resumed,
+        "budget_exceeded": budget_exceeded,
+        "elapsed_seconds": elapsed,
+        "letters_per_minute": letters_per_minute,
+        "mean_time_to_first_token": sum(first_token_times) / len(first_token_times) if first_token_times else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate cover letters for a file of job postings without prompts.")
+    parser.add_argument("jobs", help="CSV or JSONL file of job postings, or a directory of saved .txt/.md/.html postings")
+    parser.add_argument("profile", help="JSON file with the applicant profile")
+    parser.add_argument("--template", default=None, help="Template file to fill in (default: let Gemini write freely)")
+    parser.add_argument("--output-dir", default="output", help="Directory for generated files")
+    parser.add_argument("--format", choices=["txt", "pdf", "both"], default="both", help="Output format")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum number of requests in flight")
+    parser.add_argument("--pdf-workers", type=int, default=0,
+                        help="Render PDFs in this many worker processes (default: render in this process)")
+    parser.add_argument("--merged-pdf", default=None,
+                        help="Also append every letter to this single PDF with one bookmark per company")
+    parser.add_argument("--merged-pdf-split", type=int, default=0,
+                        help="Split the merged PDF into numbered files of this many letters to bound memory use")
+    parser.add_argument("--ingest-workers", type=int, default=None,
+                        help="Processes parsing a directory of postings (default: number of CPU cores)")
+    parser.add_argument("--dedupe", action="store_true",
+                        help="Archive every letter and adapt earlier letters for near-duplicate postings")
+    parser.add_argument("--journal", default=None,
+                        help="Directory of the crash-safe run journal (default: .journal inside the output directory)")
+    parser.add_argument("--no-journal", action="store_true", help="Do not keep a run journal")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the response cache")
+    parser.add_argument("--stream", action="store_true", help="Stream each letter into its .txt file as it is generated")
+    parser.add_argument("--refresh-cache", action="store_true",
+                        help="Regenerate every letter, ignoring the run journal, and overwrite cached responses")
+    args = parser.parse_args(argv)
+
+    template = None
+    if args.template:
+        template = load_template_from_file(args.template)
+        if template is None:
+            return 1
+
+    formats = ("txt", "pdf") if args.format == "both" else (args.format,)
+
+    profile = load_profile(args.profile)
+    if os.path.isdir(args.jobs):
+        from industry_index import get_industry_index
+        from ingest import ingest_directory
+        # Postings are parsed in the background and handed to generation as they are ready
+        jobs = ingest_directory(args.jobs, args.ingest_workers, industry_index=get_industry_index(config))
+        print(f"Generating cover letters for the postings in {args.jobs} "
+              f"with up to {args.concurrency} requests in flight...")
+    else:
+        jobs = load_job_records(args.jobs)
+        print(f"Generating {len(jobs)} cover letters with up to {args.concurrency} requests in flight...")
+    if config["WARM_UP"]:
+        warm_up()
+
+    summary = run_batch(jobs, profile, template, args.output_dir, formats, max(1, args.concurrency),
+                        use_cache=not args.no_cache, refresh_cache=args.refresh_cache, stream=args.stream,
+                        pdf_workers=args.pdf_workers, merged_pdf=args.merged_pdf,
+                        merged_pdf_split=args.merged_pdf_split, dedupe=args.dedupe,
+                        journal_dir=None if args.no_journal else args.journal or os.path.join(args.output_dir, ".journal"))
+
+    print(f"Done: {summary['completed']} written, {summary['failed']} failed "
+          f"in {summary['elapsed_seconds']:.1f}s ({summary['letters_per_minute']:.1f} letters/min)")
+    metrics.export_configured()
+    limiter_stats = get_rate_limiter(config).stats()
+    print(f"Rate limiting: {limiter_stats['retries']} retries, {limiter_stats['throttled']} throttled, "
+          f"final concurrency limit {limiter_stats['concurrency_limit']}")
+    hedge_stats = get_hedged_caller(config).stats()
+    for model_name, latency in hedge_stats['latency'].items():
+        if not latency['samples']:
+            # Every call to this model failed, so there are no latencies to report
+            continue
+        print(f"Model latency ({model_name}): p50 {latency['p50']:.2f}s, p99 {latency['p99']:.2f}s "
+              f"over {latency['samples']} calls")
+    print(f"Hedged requests: {hedge_stats['hedges']} ({hedge_stats['hedge_rate']:.1%} of calls), "
+          f"{hedge_stats['hedge_wins']} won; {hedge_stats['deadlines_exceeded']} deadlines exceeded")
+    if summary['resumed']:
+        print(f"Resumed from the journal: {summary['resumed']} letters already generated in an earlier run")
+    run_usage = get_usage_ledger(config).summary()
+    print(f"Usage for run {run_usage['run']}: {run_usage['tokens']} tokens, ${run_usage['cost']:.4f}")
+    if args.dedupe:
+        print(f"Near-duplicate postings: {summary['reused']} letters adapted instead of generated")
+    if summary['mean_time_to_first_token'] is not None:
+        print(f"Mean time to first token: {summary['mean_time_to_first_token']:.2f}s")
+    if not args.no_cache:
+        stats = get_response_cache(config).stats()
+        print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+    return 0 if not summary['failed'] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
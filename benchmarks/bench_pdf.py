@@ -0,0 +1,79 @@
+"""
+Measure per-PDF latency of pdf_export for the first render and later renders.
+
+The first render pays for font registration and style setup; later renders
+reuse the cached PdfRenderer. PDFs are written to memory so disk speed does
+not skew the numbers. Run from the repository root:
+
+    python benchmarks/bench_pdf.py --renders 50
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_JOB_DETAILS = {
+    'company_name': 'Acme Corporation',
+    'job_title': 'Software Engineer',
+    'your_name': 'Jane Doe',
+    'email': 'jane.doe@example.com',
+    'phone': '+1 555 0100',
+    'city': 'Springfield',
+    'country': 'USA',
+}
+
+# Roughly the size of a ~500-word letter
+SAMPLE_LETTER = "\n\n".join(
+    ["Dear Hiring Manager,"]
+    + ["I am writing to express my interest in the Software Engineer position at Acme Corporation. " * 5] * 5
+    + ["Sincerely,\nJane Doe"]
+)
+
+
+def time_render(renderer):
+    """Return the time in seconds to render the sample letter into memory"""
+    start = time.perf_counter()
+    renderer.render(SAMPLE_LETTER, SAMPLE_JOB_DETAILS, io.BytesIO())
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark PDF rendering latency.")
+    parser.add_argument("--renders", type=int, default=20, help="Number of renders after the first one")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    from pdf_export import PdfRenderer, get_renderer
+    import_time = time.perf_counter() - start
+
+    # The cold render includes building the renderer (font registration and styles)
+    start = time.perf_counter()
+    renderer = get_renderer()
+    time_render(renderer)
+    first = time.perf_counter() - start
+    later = [time_render(renderer) for _ in range(args.renders)]
+
+    # For comparison: a fresh renderer per letter, as export_to_pdf behaved before caching
+    uncached = []
+    for _ in range(min(args.renders, 10)):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fresh_renderer = PdfRenderer()
+        time_render(fresh_renderer)
+        uncached.append(time.perf_counter() - start)
+
+    print(f"import pdf_export:          {import_time * 1000:8.1f} ms")
+    print(f"first render (cold):        {first * 1000:8.1f} ms")
+    print(f"later renders (cached):     median {statistics.median(later) * 1000:.1f} ms, "
+          f"p95 {sorted(later)[int(len(later) * 0.95) - 1] * 1000:.1f} ms over {len(later)} renders")
+    print(f"renders with fresh setup:   median {statistics.median(uncached) * 1000:.1f} ms "
+          f"over {len(uncached)} renders")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Measure how long it takes to start the CLI.
+
+Each run imports main.py in a fresh interpreter, so import-time side effects
+(loading .env, importing google.generativeai or reportlab) show up directly in
+the numbers. Run from the repository root:
+
+    python benchmarks/bench_startup.py --runs 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def time_import(module, env):
+    """Return the wall time in seconds of importing module in a new interpreter"""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=REPO_ROOT, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def slowest_imports(module, env, limit):
+    """Return the slowest top-level imports reported by python -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=REPO_ROOT, env=env, check=True, capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        # Format: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Only count top-level imports, nested ones are included in their parent's cumulative time
+        if not name.startswith("  "):
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CLI startup time.")
+    parser.add_argument("--module", default="main", help="Module to import (default: main)")
+    parser.add_argument("--runs", type=int, default=10, help="Number of timed runs")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to list")
+    args = parser.parse_args(argv)
+
+    env = dict(os.environ)
+    # A placeholder key is enough; startup must not contact the API
+    env.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+    # Warm the filesystem and bytecode caches before timing
+    time_import(args.module, env)
+    timings = [time_import(args.module, env) for _ in range(args.runs)]
+
+    print(f"import {args.module}: median {statistics.median(timings) * 1000:.1f} ms, "
+          f"min {min(timings) * 1000:.1f} ms, max {max(timings) * 1000:.1f} ms over {args.runs} runs")
+    print(f"\nSlowest top-level imports:")
+    for cumulative, name in slowest_imports(args.module, env, args.top):
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Offline benchmark suite for the generation pipeline.
+
+Runs entirely against the fake model backend, so it needs no network and no
+API key, and results are reproducible from run to run. Measures:
+
+- prompt building time (including token budgeting of a long posting)
+- end-to-end batch throughput in letters per second
+- export_to_pdf time per letter
+- peak Python memory during the batch run
+
+Run from the repository root:
+
+    python benchmarks/bench_suite.py --letters 200 --concurrency 16 --latency 0.05
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+PROFILE = {
+    'your_name': 'Jane Doe',
+    'email': 'jane.doe@example.com',
+    'phone': '+1 555 0100',
+    'city': 'Springfield',
+    'country': 'USA',
+}
+
+LONG_DESCRIPTION = "\n".join(
+    ["- 5+ years of Python experience required", "- Strong knowledge of SQL and data pipelines",
+     "- Experience with cloud platforms (AWS or GCP)", "- Python experience, 5+ years, required"]
+    + [f"- We offer great benefits and a friendly culture, perk number {i}" for i in range(80)]
+)
+
+
+def make_jobs(count):
+    return [
+        {
+            'company_name': f"Company {i}",
+            'job_title': "Software Engineer",
+            'job_description': "Python, SQL, cloud platforms, teamwork",
+            'industry': "Technology",
+        }
+        for i in range(count)
+    ]
+
+
+def bench_prompt_building(iterations):
+    from generate_CL import budgeted_prompt, build_prompt
+
+    job_details = {**PROFILE, **make_jobs(1)[0], 'job_description': LONG_DESCRIPTION}
+    start = time.perf_counter()
+    for _ in range(iterations):
+        budgeted_prompt(lambda details: build_prompt(None, details), job_details)
+    elapsed = time.perf_counter() - start
+    return {"prompt_build_us": elapsed / iterations * 1e6}
+
+
+def bench_batch(letters, concurrency):
+    from batch import run_batch
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        tracemalloc.start()
+        summary = run_batch(make_jobs(letters), PROFILE, output_dir=output_dir, formats=("txt",),
+                            max_in_flight=concurrency, use_cache=False)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "letters": summary["completed"],
+        "failed": summary["failed"],
+        "letters_per_second": summary["letters_per_minute"] / 60,
+        "batch_peak_memory_mb": peak / 1024 / 1024,
+    }
+
+
+def bench_pdf(renders):
+    import contextlib
+    import io
+    from pdf_export import export_to_pdf
+    from backends import FakeBackend
+
+    letter = FakeBackend()._answer("", None)
+    job_details = {**PROFILE, **make_jobs(1)[0]}
+    timings = []
+    with tempfile.TemporaryDirectory() as output_dir, contextlib.redirect_stdout(io.StringIO()):
+        for i in range(renders):
+            start = time.perf_counter()
+            export_to_pdf(letter, job_details, os.path.join(output_dir, f"letter_{i}.pdf"))
+            timings.append(time.perf_counter() - start)
+
+    return {
+        "pdf_first_ms": timings[0] * 1000,
+        "pdf_median_ms": statistics.median(timings[1:] or timings) * 1000,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite.")
+    parser.add_argument("--letters", type=int, default=100, help="Letters generated in the batch benchmark")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight during the batch benchmark")
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake model latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.01, help="Fake model latency jitter in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fake model failure probability")
+    parser.add_argument("--pdf-renders", type=int, default=20, help="PDFs rendered in the PDF benchmark")
+    parser.add_argument("--json", action="store_true", help="Print results as one JSON object")
+    args = parser.parse_args(argv)
+
+    # Configure before any project module reads the configuration
+    os.environ["MODEL_BACKEND"] = "fake"
+    os.environ["FAKE_LATENCY"] = str(args.latency)
+    os.environ["FAKE_JITTER"] = str(args.jitter)
+    os.environ["FAKE_FAILURE_RATE"] = str(args.failure_rate)
+    os.environ["WARM_UP"] = "false"
+    # Measure the pipeline, not the quota settings
+    os.environ["REQUESTS_PER_MINUTE"] = "0"
+    os.environ["TOKENS_PER_MINUTE"] = "0"
+    os.environ["MAX_CONCURRENCY"] = str(args.concurrency)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        # Benchmark calls are not real usage, so they stay out of the shared usage ledger
+        os.environ["USAGE_LEDGER_PATH"] = os.path.join(scratch_dir, "usage.jsonl")
+        results.update(bench_prompt_building(1000))
+        results.update(bench_batch(args.letters, args.concurrency))
+        results.update(bench_pdf(args.pdf_renders))
+
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for name, value in results.items():
+            print(f"{name:24s} {value:10.2f}" if isinstance(value, float) else f"{name:24s} {value:10d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import metrics
+
+
+def make_cache_key(prompt, model_name, backend_name="gemini"):
+    """
+    Build a content-addressed cache key for a prompt and model.
+
+    Args:
+        prompt (str): The fully built prompt sent to the model
+        model_name (str): The name of the model the prompt is sent to
+        backend_name (str): The backend answering it, so fake answers are never served to real runs
+
+    Returns:
+        str: Hex SHA-256 digest identifying the request
+    """
+    digest = hashlib.sha256()
+    if backend_name != "gemini":
+        # Gemini keys stay as they were, so existing caches remain valid
+        digest.update(backend_name.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(model_name.encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(prompt.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed cache of model responses with TTL and LRU eviction"""
+
+    def __init__(self, cache_dir=".cache", ttl_seconds=30 * 24 * 3600, max_entries=1000):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "responses.sqlite3")
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # The batch runner calls the cache from worker threads, so share one connection behind a lock
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached response for key, or None if it is missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or (self.ttl_seconds and now - row[1] > self.ttl_seconds):
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                metrics.increment("cache_misses_total", cache="responses")
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            metrics.increment("cache_hits_total", cache="responses")
+            return row[0]
+
+    def put(self, key, model_name, response):
+        """Store a response and evict the least recently used entries beyond max_entries"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, model_name, response, now, now),
+            )
+            if self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+            if self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    " SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        """Return hit/miss counters and the current number of entries"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache(config):
+    """Return the process-wide response cache, creating it on first use"""
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache(
+                cache_dir=config["CACHE_DIR"],
+                ttl_seconds=config["CACHE_TTL_SECONDS"],
+                max_entries=config["CACHE_MAX_ENTRIES"],
+            )
+        return _response_cache
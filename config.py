@@ -1,19 +1,93 @@
+import json
 import os
+import threading
 from dotenv import load_dotenv
-import google.generativeai as genai  # Import Gemini API
+
+_config = None
+_genai = None
+_lock = threading.Lock()
 
 def load_config():
-    """Load environment variables and configure the API"""
+    """Load environment variables once and return the shared configuration"""
+    global _config
+    with _lock:
+        if _config is not None:
+            return _config
+
+        load_dotenv()
+        api_key = os.getenv("GOOGLE_API_KEY")
+        backend = os.getenv("MODEL_BACKEND", "gemini")
+
+        # The fake backend never calls the API, so it runs without a key
+        if not api_key and backend != "fake":
+            raise ValueError("GOOGLE_API_KEY is missing. Please set it in your .env file.")
+
+        # Letters, postings and industries learned from the fake backend's filler answers
+        # are kept apart from real ones
+        state_dir = ".cache" if backend == "gemini" else os.path.join(".cache", backend)
+
+        _config = {
+            "GOOGLE_API_KEY": api_key,
+            "DEFAULT_MODEL": "gemini-1.5-pro",
+            # Industry suggestions are short and structured, so they use a cheaper, faster model tier
+            "SUGGEST_MODEL": os.getenv("SUGGEST_MODEL", "gemini-1.5-flash"),
+            "SUGGEST_GENERATION_CONFIG": {"temperature": 0.2, "max_output_tokens": 100},
+            "MODEL_BACKEND": backend,  # "gemini" or "fake"
+            "FAKE_LATENCY": float(os.getenv("FAKE_LATENCY", 0.5)),
+            "FAKE_JITTER": float(os.getenv("FAKE_JITTER", 0.1)),
+            "FAKE_FAILURE_RATE": float(os.getenv("FAKE_FAILURE_RATE", 0.0)),
+            "FAKE_RESPONSE_WORDS": int(os.getenv("FAKE_RESPONSE_WORDS", 500)),
+            "FAKE_TAIL_RATE": float(os.getenv("FAKE_TAIL_RATE", 0.0)),
+            "FAKE_TAIL_LATENCY": float(os.getenv("FAKE_TAIL_LATENCY", 5.0)),
+            "TEMPLATE_PATH": "template.txt",
+            "CACHE_DIR": os.getenv("CACHE_DIR", ".cache"),
+            "CACHE_TTL_SECONDS": int(os.getenv("CACHE_TTL_SECONDS", 30 * 24 * 3600)),
+            "CACHE_MAX_ENTRIES": int(os.getenv("CACHE_MAX_ENTRIES", 1000)),
+            "INDUSTRY_INDEX_PATH": os.getenv("INDUSTRY_INDEX_PATH", os.path.join(state_dir, "industries.json")),
+            "INDUSTRY_SEED_PATH": os.getenv("INDUSTRY_SEED_PATH"),
+            "ARCHIVE_ENABLED": os.getenv("ARCHIVE_ENABLED", "true").lower() in ("1", "true", "yes"),
+            "ARCHIVE_PATH": os.getenv("ARCHIVE_PATH", os.path.join(state_dir, "letters.sqlite3")),
+            "POSTING_INDEX_PATH": os.getenv("POSTING_INDEX_PATH", os.path.join(state_dir, "postings.npz")),
+            # Postings at least this similar (cosine, 0-1) to an archived one adapt its letter instead
+            "DUPLICATE_THRESHOLD": float(os.getenv("DUPLICATE_THRESHOLD", 0.85)),
+            "PROMPT_TOKEN_BUDGET": int(os.getenv("PROMPT_TOKEN_BUDGET", 1000)),
+            "PROMPT_TOKEN_COUNTER": os.getenv("PROMPT_TOKEN_COUNTER", "local"),  # "local" or "sdk"
+            "REQUESTS_PER_MINUTE": int(os.getenv("REQUESTS_PER_MINUTE", 60)),
+            "TOKENS_PER_MINUTE": int(os.getenv("TOKENS_PER_MINUTE", 1000000)),
+            "MAX_RETRIES": int(os.getenv("MAX_RETRIES", 5)),
+            "MAX_CONCURRENCY": int(os.getenv("MAX_CONCURRENCY", 32)),
+            "MODEL_CALL_TIMEOUT": float(os.getenv("MODEL_CALL_TIMEOUT", 120)),  # seconds per attempt, 0 for none
+            # Send a duplicate request once a call is slower than this percentile of recent calls (0 to disable)
+            "HEDGE_PERCENTILE": float(os.getenv("HEDGE_PERCENTILE", 95)),
+            "HEDGE_BUDGET": float(os.getenv("HEDGE_BUDGET", 0.05)),  # extra requests as a fraction of all calls
+            "HEDGE_MIN_SAMPLES": int(os.getenv("HEDGE_MIN_SAMPLES", 20)),
+            "USAGE_LEDGER_PATH": os.getenv("USAGE_LEDGER_PATH", os.path.join(".cache", "usage.jsonl")),
+            "RUN_TOKEN_BUDGET": int(os.getenv("RUN_TOKEN_BUDGET", 0)),  # 0 for no limit
+            "RUN_COST_BUDGET": float(os.getenv("RUN_COST_BUDGET", 0.0)),  # USD, 0 for no limit
+            # JSON object of model name to [prompt, output] USD per million tokens
+            "MODEL_PRICES": json.loads(os.getenv("MODEL_PRICES", "{}")),
+            **metrics_settings(),
+            "WARM_UP": os.getenv("WARM_UP", "true").lower() in ("1", "true", "yes"),
+        }
+        return _config
+
+def metrics_settings():
+    """Read the METRICS_* settings; unlike load_config() this needs no API key, so PDF-only processes can use it"""
     load_dotenv()
-    api_key = os.getenv("GOOGLE_API_KEY")
-    
-    if not api_key:
-        raise ValueError("GOOGLE_API_KEY is missing. Please set it in your .env file.")
-    
-    genai.configure(api_key=api_key)  # Ensure the API key is set globally
-    
     return {
-        "GOOGLE_API_KEY": api_key,
-        "DEFAULT_MODEL": "gemini-1.5-pro",
-        "TEMPLATE_PATH": "template.txt",
+        "METRICS_ENABLED": os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes"),
+        "METRICS_JSONL_PATH": os.getenv("METRICS_JSONL_PATH"),
+        "METRICS_PROMETHEUS_PATH": os.getenv("METRICS_PROMETHEUS_PATH"),
     }
+
+def get_genai():
+    """Import google.generativeai and configure the API key on first use"""
+    global _genai
+    config = load_config()
+    with _lock:
+        if _genai is None:
+            import google.generativeai as genai  # Import Gemini API only when a model is needed
+
+            genai.configure(api_key=config["GOOGLE_API_KEY"])  # Ensure the API key is set globally
+            _genai = genai
+        return _genai
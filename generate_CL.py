@@ -1,32 +1,35 @@
-import google.generativeai as genai
+import time
+
 from config import load_config  # Import config
+from cache import get_response_cache, make_cache_key
+from metrics import metrics
+from model_pool import generate_content, get_backend
+from prompt_budget import count_prompt_tokens, estimate_tokens, fit_prompt
+from template_engine import compile_template
+from usage import template_label, usage_labels
 
-# Ensure API key is loaded
+# Load the shared configuration (read once per process)
 config = load_config()
 
-def generate_cover_letter(template, job_details):
+def build_prompt(template, job_details):
     """
-    Generate a cover letter using the Gemini API.
-    
+    Build the Gemini prompt for a cover letter.
+
     Args:
-        template (str): The cover letter template with placeholders (if user chose to use existing template)
+        template (str): The cover letter template with placeholders, or None to write the letter freely
         job_details (dict): Dictionary containing job details like company, role, etc.
-    
+
     Returns:
-        str: The generated cover letter
+        str: The prompt to send to the model
     """
-    # Initialize the Gemini model
-    model = genai.GenerativeModel(config["DEFAULT_MODEL"])  # Use config
-    
-
     if template:
         # Create the prompt for the AI
-        prompt = f"""
+        return f"""
         I need to generate a professional cover letter based on the template below. You must only fill in the template's blank spots and not add any additional text.
-        
+
         Template:
         {template}
-        
+
         Please fill in this template appropriately knowing the following information:
         - Company name: {job_details.get('company_name', '')}
         - Job title: {job_details.get('job_title', '')}
@@ -36,16 +39,12 @@ def generate_cover_letter(template, job_details):
         - Email: {job_details.get('email', '')}
         - Phone: {job_details.get('phone', '')}
         - Location: {job_details.get('city', '')}, {job_details.get('country', '')}
-        
+
         Make the cover letter sound natural, professional, and enthusiastic. Ensure it highlights how my skills and experience match the job requirements.
         Do not add any text outside of the letter itself - I need only the final filled-in cover letter.
         """
-        
-        # Generate the cover letter
-        response = model.generate_content(prompt)
-        return response.text
     else:
-        prompt = f"""
+        return f"""
             I need to generate a professional cover letter of ~500 words tailored specifically to this job application.
 
             **Important Instructions:**
@@ -67,7 +66,223 @@ def generate_cover_letter(template, job_details):
             Please generate a fully formatted and complete cover letter that sounds natural and polished.
             """
 
+def build_adaptation_prompt(base_letter, job_details):
+    """
+    Build a prompt that adapts an earlier cover letter to a new job posting.
+
+    Args:
+        base_letter (str): A previously generated cover letter, e.g. from the letter archive
+        job_details (dict): Dictionary containing job details like company, role, etc.
+
+    Returns:
+        str: The prompt to send to the model
+    """
+    return f"""Adapt the cover letter below to a new job application. Keep its structure, tone and length, replace every detail that belongs to the old application, and rewrite the arguments so they match the new job requirements. Return only the finished letter.
+
+New job details:
+- Company name: {job_details.get('company_name', '')}
+- Job title: {job_details.get('job_title', '')}
+- Job description highlights: {job_details.get('job_description', '')}
+- Industry: {job_details.get('industry', '')}
+- Your name: {job_details.get('your_name', '')}
+- Email: {job_details.get('email', '')}
+- Phone: {job_details.get('phone', '')}
+- Location: {job_details.get('city', '')}, {job_details.get('country', '')}
+
+Cover letter:
+{base_letter}"""
+
+def letter_prompt_builder(template, base_letter=None):
+    """Return the function building the letter prompt from job_details"""
+    if base_letter:
+        return lambda details: build_adaptation_prompt(base_letter, details)
+    return lambda details: build_prompt(template, details)
+
+def budgeted_prompt(build, job_details, unbudgeted_text=None):
+    """
+    Build a prompt within config["PROMPT_TOKEN_BUDGET"], trimming the job description if needed.
+
+    Args:
+        build (callable): Function taking job_details and returning the prompt text
+        job_details (dict): Dictionary containing job details like company, role, etc.
+        unbudgeted_text (str): Text in the prompt that the budget does not cover, e.g. a base letter
+            to adapt, so it doesn't crowd out the job description
+
+    Returns:
+        str: The prompt to send
+    """
+    if config["PROMPT_TOKEN_COUNTER"] == "sdk":
+        count_tokens = lambda prompt: count_prompt_tokens(prompt, use_sdk=True, model_name=config["DEFAULT_MODEL"])
+    else:
+        count_tokens = estimate_tokens
+    max_tokens = config["PROMPT_TOKEN_BUDGET"]
+    if max_tokens and unbudgeted_text:
+        max_tokens += count_tokens(unbudgeted_text)
+    prompt, _ = fit_prompt(build, job_details, max_tokens, count_tokens)
+    return prompt
+
+def generate_text(prompt, model_name=None, use_cache=True, refresh=False, generation_config=None):
+    """
+    Send a prompt to the model, going through the on-disk response cache.
+
+    Args:
+        prompt (str): The prompt to send
+        model_name (str): The Gemini model name (default: config["DEFAULT_MODEL"])
+        use_cache (bool): Look up and store the response in the on-disk response cache
+        refresh (bool): Skip the cache lookup and overwrite the cached response with a fresh one
+        generation_config (dict): Optional generation settings
+
+    Returns:
+        str: The response text
+    """
+    model_name = model_name or config["DEFAULT_MODEL"]
+
+    # Identical prompts sent to the same model reuse the earlier response
+    cache = get_response_cache(config) if use_cache else None
+    cache_key = make_cache_key(prompt, model_name, get_backend().name)
+    if cache is not None and not refresh:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    response = generate_content(prompt, model_name, generation_config)
+    if cache is not None:
+        cache.put(cache_key, model_name, response.text)
+    return response.text
+
+def fill_template(template, job_details, use_cache=True, refresh=False):
+    """
+    Fill a template with bracketed placeholders, asking the model only for the free-text slots.
+
+    Known fields such as [Your Name] or [Company Name] are filled in locally. Any
+    other placeholder is sent to the model in one compact JSON request.
 
-        # Generate the cover letter
-        response = model.generate_content(prompt)
-        return response.text
+    Args:
+        template (str): The cover letter template with [placeholders]
+        job_details (dict): Dictionary containing job details like company, role, etc.
+        use_cache (bool): Look up and store the response in the on-disk response cache
+        refresh (bool): Skip the cache lookup and overwrite the cached response with a fresh one
+
+    Returns:
+        str: The filled-in cover letter, or None if the template has no bracketed placeholders
+    """
+    compiled = compile_template(template)
+    if not compiled.has_placeholders:
+        return None
+
+    if not compiled.slots:
+        # Every placeholder is a known field, so no API call is needed
+        return compiled.render(job_details)
+
+    slot_prompt = budgeted_prompt(compiled.build_slot_prompt, job_details)
+    response_text = generate_text(slot_prompt, use_cache=use_cache, refresh=refresh,
+                                  generation_config={"response_mime_type": "application/json"})
+    return compiled.render(job_details, compiled.parse_slot_response(response_text))
+
+def generate_cover_letter(template, job_details, use_cache=True, refresh=False, base_letter=None):
+    """
+    Generate a cover letter using the Gemini API.
+
+    Args:
+        template (str): The cover letter template with placeholders (if user chose to use existing template)
+        job_details (dict): Dictionary containing job details like company, role, etc.
+        use_cache (bool): Look up and store the response in the on-disk response cache
+        refresh (bool): Skip the cache lookup and overwrite the cached response with a fresh one
+        base_letter (str): An earlier letter to adapt instead of writing from scratch
+
+    Returns:
+        str: The generated cover letter
+    """
+    with metrics.timer("generate_cover_letter"), usage_labels(template=template_label(template), operation="letter"):
+        return _generate_cover_letter(template, job_details, use_cache, refresh, base_letter)
+
+def _generate_cover_letter(template, job_details, use_cache, refresh, base_letter=None):
+    if template and not base_letter:
+        try:
+            cover_letter = fill_template(template, job_details, use_cache, refresh)
+            if cover_letter is not None:
+                return cover_letter
+        except ValueError as e:
+            # Malformed slot answer: fall back to sending the whole template
+            print(f"Could not fill template slots locally ({e}), sending the full template instead.")
+
+    # Generate the cover letter with the pooled model
+    prompt = budgeted_prompt(letter_prompt_builder(template, base_letter), job_details, base_letter)
+    return generate_text(prompt, use_cache=use_cache, refresh=refresh)
+
+def stream_cover_letter(template, job_details, timings=None, use_cache=True, refresh=False, base_letter=None):
+    """
+    Generate a cover letter with the Gemini API, yielding text as it is produced.
+
+    Args:
+        template (str): The cover letter template with placeholders (if user chose to use existing template)
+        job_details (dict): Dictionary containing job details like company, role, etc.
+        timings (dict): Optional dictionary that receives 'time_to_first_token' and 'total_time' in seconds
+        use_cache (bool): Look up and store the response in the on-disk response cache
+        refresh (bool): Skip the cache lookup and overwrite the cached response with a fresh one
+        base_letter (str): An earlier letter to adapt instead of writing from scratch
+
+    Yields:
+        str: Consecutive chunks of the generated cover letter
+    """
+    if timings is None:
+        timings = {}
+    start = time.perf_counter()
+
+    if template and not base_letter and compile_template(template).has_placeholders:
+        # Slot answers are short JSON, so templates with placeholders are filled in one piece
+        cover_letter = generate_cover_letter(template, job_details, use_cache, refresh)
+        timings['time_to_first_token'] = timings['total_time'] = time.perf_counter() - start
+        yield cover_letter
+        return
+
+    prompt = budgeted_prompt(letter_prompt_builder(template, base_letter), job_details, base_letter)
+    model_name = config["DEFAULT_MODEL"]
+
+    cache = get_response_cache(config) if use_cache else None
+    cache_key = make_cache_key(prompt, model_name, get_backend().name)
+    if cache is not None and not refresh:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            timings['time_to_first_token'] = timings['total_time'] = time.perf_counter() - start
+            yield cached
+            return
+
+    # Labels are bound when the call is made, so they don't leak across the yields below
+    with usage_labels(template=template_label(template), operation="letter"):
+        response = generate_content(prompt, model_name, stream=True)
+
+    chunks = []
+    for chunk in response:
+        # Chunks without text parts (e.g. a final safety-rating chunk) raise on .text
+        try:
+            text = chunk.text
+        except ValueError:
+            continue
+        if not text:
+            continue
+        if 'time_to_first_token' not in timings:
+            timings['time_to_first_token'] = time.perf_counter() - start
+        chunks.append(text)
+        yield text
+
+    timings['total_time'] = time.perf_counter() - start
+    if cache is not None:
+        cache.put(cache_key, model_name, ''.join(chunks))
+
+def stream_to_file(chunks, output_filename):
+    """
+    Write streamed text to a file as it arrives, passing each chunk through.
+
+    Args:
+        chunks (iterable): Text chunks, e.g. from stream_cover_letter()
+        output_filename (str): The file to write
+
+    Yields:
+        str: The same chunks, after each has been written and flushed
+    """
+    with open(output_filename, 'w') as file:
+        for chunk in chunks:
+            file.write(chunk)
+            file.flush()
+            yield chunk
@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import LATENCY_BUCKETS, metrics
+
+# Recent call latencies kept per model for the percentile estimates
+LATENCY_WINDOW = 1000
+
+
+class DeadlineExceeded(Exception):
+    """A model call did not answer within its deadline; .code makes the rate limiter retry it"""
+
+    def __init__(self, message, code=504):
+        super().__init__(message)
+        self.code = code
+
+
+class LatencyTracker:
+    """Sliding window of recent call latencies with percentile lookups"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, latency):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def __len__(self):
+        return len(self._latencies)
+
+    def percentile(self, percent):
+        """Return the given percentile (0-100) of the recent latencies, or None without samples"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        index = min(len(latencies) - 1, int(round(percent / 100 * (len(latencies) - 1))))
+        return latencies[index]
+
+
+class HedgedCaller:
+    """
+    Run blocking model calls with a deadline, sending a duplicate when one is unusually slow.
+
+    If a call has not answered by the hedge_percentile latency of recent calls
+    to the same model, an identical call is started and whichever answers
+    first is used. Hedges are capped at hedge_budget extra requests per call
+    made, so the extra load stays bounded even when every call is slow.
+
+    Args:
+        timeout (float): Seconds a call may take before DeadlineExceeded is raised (0 for no deadline)
+        hedge_percentile (float): Latency percentile (0-100) after which a duplicate is sent (0 to disable)
+        hedge_budget (float): Maximum hedged requests as a fraction of all calls, e.g. 0.05
+        min_samples (int): Latencies to observe for a model before hedging its calls
+        max_workers (int): Threads available for calls and their hedges
+    """
+
+    def __init__(self, timeout=120.0, hedge_percentile=95.0, hedge_budget=0.05, min_samples=20, max_workers=64):
+        self.timeout = timeout
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.min_samples = min_samples
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadlines_exceeded = 0
+        self._trackers = {}
+        self._lock = threading.Lock()
+        # Abandoned calls keep their thread until they return, so the pool is larger than the concurrency limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-call")
+
+    def tracker(self, model_name):
+        with self._lock:
+            tracker = self._trackers.get(model_name)
+            if tracker is None:
+                tracker = self._trackers[model_name] = LatencyTracker()
+            return tracker
+
+    def _hedge_delay(self, tracker):
+        if not self.hedge_percentile or len(tracker) < self.min_samples:
+            return None
+        return tracker.percentile(self.hedge_percentile)
+
+    def _take_hedge(self):
+        with self._lock:
+            if self.hedges + 1 > self.hedge_budget * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def call(self, function, model_name, timeout=None, hedge=True, hedge_function=None):
+        """
+        Run function() on a worker thread within a deadline, hedging it if it runs long.
+
+        Args:
+            function (callable): The blocking model call
+            model_name (str): Model the call goes to; latencies are tracked per model
+            timeout (float): Deadline in seconds (default: the caller's timeout; 0 for none)
+            hedge (bool): Allow a duplicate request, e.g. False for streamed calls
+            hedge_function (callable): Makes the duplicate request; it is passed a threading.Event
+                that is set once the call has returned, so a hedge still waiting for rate limits
+                can give up (default: call function() again)
+
+        Returns:
+            The return value of whichever call answered first
+        """
+        if hedge_function is None:
+            hedge_function = lambda settled: function()
+        settled = threading.Event()
+        try:
+            return self._call(function, hedge_function, settled, model_name, timeout, hedge)
+        finally:
+            settled.set()
+
+    def _call(self, function, hedge_function, settled, model_name, timeout, hedge):
+        timeout = self.timeout if timeout is None else timeout
+        tracker = self.tracker(model_name)
+        with self._lock:
+            self.calls += 1
+
+        start = time.perf_counter()
+        deadline = start + timeout if timeout else None
+        pending = {self._executor.submit(function)}
+        hedged = None
+        hedge_delay = self._hedge_delay(tracker) if hedge else None
+        first_error = None
+
+        while pending:
+            now = time.perf_counter()
+            remaining = deadline - now if deadline else None
+            wait_for = remaining
+            if hedge_delay is not None and hedged is None:
+                until_hedge = max(0.0, start + hedge_delay - now)
+                wait_for = until_hedge if remaining is None else min(until_hedge, remaining)
+            if remaining is not None and remaining <= 0:
+                break
+
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    latency = time.perf_counter() - start
+                    tracker.observe(latency)
+                    metrics.observe("model_call_latency_seconds", latency, LATENCY_BUCKETS, model=model_name)
+                    if future is hedged:
+                        with self._lock:
+                            self.hedge_wins += 1
+                        metrics.increment("hedge_wins_total", model=model_name)
+                    return future.result()
+                # Keep waiting for the other request, if there is one
+                first_error = first_error or error
+
+            if not done and hedged is None and hedge_delay is not None and self._take_hedge():
+                hedged = self._executor.submit(hedge_function, settled)
+                pending.add(hedged)
+                metrics.increment("hedges_total", model=model_name)
+            elif not done and hedged is None:
+                # No hedge allowed for this call; wait for the deadline only
+                hedge_delay = None
+
+        if first_error is not None and not pending:
+            raise first_error
+        with self._lock:
+            self.deadlines_exceeded += 1
+        metrics.increment("deadlines_exceeded_total", model=model_name)
+        raise DeadlineExceeded(f"{model_name} did not answer within {timeout:.1f}s")
+
+    def stats(self):
+        """Return p50/p99 latency per model and the hedge and deadline counters"""
+        with self._lock:
+            trackers = dict(self._trackers)
+            stats = {
+                "calls": self.calls,
+                "hedges": self.hedges,
+                "hedge_rate": self.hedges / self.calls if self.calls else 0.0,
+                "hedge_wins": self.hedge_wins,
+                "deadlines_exceeded": self.deadlines_exceeded,
+            }
+        stats["latency"] = {
+            model_name: {"p50": tracker.percentile(50), "p99": tracker.percentile(99), "samples": len(tracker)}
+            for model_name, tracker in trackers.items()
+        }
+        return stats
+
+
+_hedged_caller = None
+_hedged_caller_lock = threading.Lock()
+
+
+def get_hedged_caller(config):
+    """Return the process-wide hedged caller shared by every model call"""
+    global _hedged_caller
+    with _hedged_caller_lock:
+        if _hedged_caller is None:
+            _hedged_caller = HedgedCaller(
+                timeout=config["MODEL_CALL_TIMEOUT"],
+                hedge_percentile=config["HEDGE_PERCENTILE"],
+                hedge_budget=config["HEDGE_BUDGET"],
+                min_samples=config["HEDGE_MIN_SAMPLES"],
+                max_workers=2 * config["MAX_CONCURRENCY"],
+            )
+        return _hedged_caller
@@ -0,0 +1,142 @@
+import csv
+import difflib
+import json
+import os
+import re
+import threading
+
+# Legal-form suffixes that do not change which company a name refers to
+COMPANY_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "llc", "llp", "lp",
+    "ltd", "limited", "plc", "gmbh", "ag", "kg", "se", "sa", "sas", "sarl", "srl", "spa",
+    "bv", "nv", "ab", "as", "oy", "pty", "kk", "group", "holding", "holdings",
+}
+
+
+def normalize_company_name(company_name):
+    """
+    Normalize a company name so that spelling variants share one index key.
+
+    Args:
+        company_name (str): The company name as typed by the user
+
+    Returns:
+        str: Lowercase name without punctuation or trailing legal-form suffixes
+    """
+    words = re.sub(r"[^\w\s]", " ", company_name.lower()).split()
+    # Strip suffixes from the end only, so names like "Group Health" keep their first word
+    while len(words) > 1 and words[-1] in COMPANY_SUFFIXES:
+        words.pop()
+    return " ".join(words)
+
+
+class IndustryIndex:
+    """Persistent map from normalized company names to suggested industries"""
+
+    def __init__(self, path, fuzzy_cutoff=0.85):
+        self.path = path
+        self.fuzzy_cutoff = fuzzy_cutoff
+        self._lock = threading.Lock()
+        self._entries = {}
+        if os.path.exists(path):
+            with open(path, 'r') as file:
+                self._entries = json.load(file)
+
+    def lookup(self, company_name):
+        """
+        Find industries for a company, falling back to the closest known name.
+
+        Args:
+            company_name (str): The name of the company
+
+        Returns:
+            list: The stored industries, or None if no close enough name is indexed
+        """
+        key = normalize_company_name(company_name)
+        if not key:
+            return None
+
+        with self._lock:
+            if key in self._entries:
+                return list(self._entries[key])
+
+            matches = difflib.get_close_matches(key, self._entries.keys(), n=1, cutoff=self.fuzzy_cutoff)
+            if matches:
+                return list(self._entries[matches[0]])
+        return None
+
+    def add(self, company_name, industries, save=True, overwrite=True):
+        """
+        Store industries for a company and optionally write the index to disk.
+
+        Returns:
+            bool: True if the entry was stored, False if it was empty or overwrite=False kept an existing one
+        """
+        key = normalize_company_name(company_name)
+        if not key or not industries:
+            return False
+        with self._lock:
+            if not overwrite and key in self._entries:
+                return False
+            self._entries[key] = list(industries)
+        if save:
+            self.save()
+        return True
+
+    def preload(self, seed_path):
+        """
+        Load entries from a seed file.
+
+        Seed values only fill in companies the index doesn't know yet, so
+        industries learned from model answers are never replaced by them.
+
+        Args:
+            seed_path (str): A JSON object mapping company names to industry lists,
+                or a CSV file whose rows are a company name followed by its industries
+
+        Returns:
+            int: Number of companies added
+        """
+        if seed_path.lower().endswith('.csv'):
+            with open(seed_path, 'r', newline='') as file:
+                seeds = [(row[0], [cell.strip() for cell in row[1:] if cell.strip()])
+                         for row in csv.reader(file) if row]
+        else:
+            with open(seed_path, 'r') as file:
+                seeds = list(json.load(file).items())
+
+        loaded = sum(1 for company_name, industries in seeds
+                     if self.add(company_name, industries, save=False, overwrite=False))
+        if loaded:
+            self.save()
+        return loaded
+
+    def save(self):
+        """Write the index to disk atomically"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as file:
+                json.dump(self._entries, file, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_industry_index = None
+_industry_index_lock = threading.Lock()
+
+
+def get_industry_index(config):
+    """Return the process-wide industry index, loading it and its seed file on first use"""
+    global _industry_index
+    with _industry_index_lock:
+        if _industry_index is None:
+            _industry_index = IndustryIndex(config["INDUSTRY_INDEX_PATH"])
+            seed_path = config.get("INDUSTRY_SEED_PATH")
+            if seed_path and os.path.exists(seed_path):
+                _industry_index.preload(seed_path)
+        return _industry_index
@@ -0,0 +1,394 @@
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from html.parser import HTMLParser
+
+import numpy as np
+
+from prompt_budget import REQUIREMENT_CUES, STOPWORDS
+
+SUPPORTED_EXTENSIONS = ('.txt', '.md', '.markdown', '.html', '.htm')
+
+# Requirement phrases kept per posting
+TOP_REQUIREMENTS = 8
+
+# Lines longer than this are prose paragraphs, which are split into sentences first
+MAX_PHRASE_WORDS = 30
+
+# Headings that open the part of a posting listing what the applicant needs
+REQUIREMENT_HEADINGS = ("requirement", "qualification", "what you", "you have", "you bring", "you will need",
+                        "skills", "must have", "nice to have", "who you are", "profile", "experience")
+
+# Headings of sections that never hold requirements
+SKIPPED_HEADINGS = ("benefit", "perk", "we offer", "about us", "about the company", "equal opportunit",
+                    "how to apply", "salary", "compensation", "why join")
+
+# Score added to phrases listed under a requirements heading
+SECTION_BONUS = 2.0
+
+_BLOCK_TAGS = {"p", "div", "br", "li", "ul", "ol", "tr", "section", "article", "header", "footer",
+               "h1", "h2", "h3", "h4", "h5", "h6", "dt", "dd", "table"}
+_SKIPPED_TAGS = {"script", "style", "noscript", "svg", "head"}
+
+_LABEL_PATTERNS = {
+    'company_name': re.compile(r"^\s*(?:company(?: name)?|employer|organi[sz]ation)\s*[:\-–]\s*(.+?)\s*$", re.I | re.M),
+    'job_title': re.compile(r"^\s*(?:job title|position|role|title)\s*[:\-–]\s*(.+?)\s*$", re.I | re.M),
+}
+_TITLE_AT_COMPANY = re.compile(r"^(.{3,80}?)\s+(?:at|@|[-–|])\s+(.{2,60})$")
+_COMPANY_NAME = r"([A-Z][\w&.'\-]*(?:\s+[A-Z][\w&.'\-]*){0,3})"
+_COMPANY_PATTERNS = [
+    re.compile(rf"\b{_COMPANY_NAME}\s+is\s+(?:hiring|looking|seeking)"),
+    re.compile(rf"\bAbout\s+{_COMPANY_NAME}"),
+    re.compile(rf"\bJoin\s+{_COMPANY_NAME}"),
+]
+_BULLET_PATTERN = re.compile(r"^\s*(?:[-*•▪●+]|\d+[.)])\s+")
+_MARKDOWN_HEADING = re.compile(r"^\s*#{1,6}\s+")
+_MARKDOWN_MARKUP = re.compile(r"\*\*|__|`|\[([^\]]*)\]\([^)]*\)")
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+_WORD_PATTERN = re.compile(r"[a-z0-9+#.]+")
+
+
+class _TextExtractor(HTMLParser):
+    """Collect the visible text of an HTML page, one line per block element"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.title = ''
+        self.headings = []
+        self._skipping = 0
+        self._current = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIPPED_TAGS:
+            self._skipping += 1
+        if tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+        if tag == "li":
+            self.parts.append("- ")
+        if tag in ("title", "h1", "h2", "h3", "h4"):
+            self._current = [tag, []]
+
+    def handle_endtag(self, tag):
+        if tag in _SKIPPED_TAGS and self._skipping:
+            self._skipping -= 1
+        if tag in _BLOCK_TAGS:
+            self.parts.append("\n")
+        if self._current is not None and tag == self._current[0]:
+            text = " ".join("".join(self._current[1]).split())
+            if tag == "title":
+                self.title = text
+            elif text:
+                self.headings.append(text)
+                # Mark headings so section detection also works on HTML
+                self.parts.append("\n")
+            self._current = None
+
+    def handle_data(self, data):
+        if self._current is not None:
+            self._current[1].append(data)
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def html_to_text(html):
+    """
+    Extract visible text from an HTML page.
+
+    Returns:
+        tuple: (text with one block per line, page title, list of headings)
+    """
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    lines = [" ".join(line.split()) for line in "".join(extractor.parts).splitlines()]
+    return "\n".join(line for line in lines if line), extractor.title, extractor.headings
+
+
+def markdown_to_text(markdown):
+    """
+    Strip Markdown markup, keeping one block per line.
+
+    Returns:
+        tuple: (plain text, list of headings)
+    """
+    headings = []
+    lines = []
+    for line in markdown.splitlines():
+        if _MARKDOWN_HEADING.match(line):
+            line = _MARKDOWN_HEADING.sub("", line)
+            headings.append(_MARKDOWN_MARKUP.sub(r"\1", line).strip())
+        lines.append(_MARKDOWN_MARKUP.sub(r"\1", line).rstrip())
+    return "\n".join(lines), headings
+
+
+def _section(line, headings):
+    """Classify a heading line as opening a requirements or skipped section, or return False"""
+    text = line.lower().rstrip(":").strip()
+    is_heading = line in headings or (line.endswith(":") and len(text.split()) <= 6)
+    if not is_heading:
+        return False
+    if any(cue in text for cue in SKIPPED_HEADINGS):
+        return "skipped"
+    if any(cue in text for cue in REQUIREMENT_HEADINGS):
+        return "requirements"
+    return None
+
+
+def candidate_phrases(text, headings=()):
+    """
+    Split posting text into requirement candidates, each tagged with its section.
+
+    Returns:
+        list: (phrase, section) pairs where section is "requirements" or None; lines under
+            benefit or company headings and "Label: value" lines are left out
+    """
+    headings = set(headings)
+    section = None
+    phrases = []
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        heading = _section(line, headings)
+        if heading is not False:
+            section = heading
+            continue
+        if section == "skipped" or any(pattern.match(line) for pattern in _LABEL_PATTERNS.values()):
+            continue
+        line = _BULLET_PATTERN.sub("", line)
+        pieces = _SENTENCE_PATTERN.split(line) if len(line.split()) > MAX_PHRASE_WORDS else [line]
+        for piece in pieces:
+            piece = piece.strip().rstrip(".;")
+            if piece and len(piece.split()) <= MAX_PHRASE_WORDS:
+                phrases.append((piece, section))
+    return phrases
+
+
+def top_requirements(phrases, count=TOP_REQUIREMENTS):
+    """
+    Rank requirement candidates with vectorized keyword scoring and keep the best.
+
+    A phrase scores for requirement cue words ("required", "years", ...), for
+    containing a number, for words that are rare within the posting, and for
+    sitting under a requirements heading. Phrases with neither a cue word nor a
+    requirements heading are only kept when nothing else qualifies.
+
+    Args:
+        phrases (list): (phrase, section) pairs from candidate_phrases()
+        count (int): Number of phrases to keep
+
+    Returns:
+        list: The best phrases, in the order they appear in the posting
+    """
+    # Drop duplicates, including reordered ones
+    unique = []
+    word_lists = []
+    seen = set()
+    for phrase, section in phrases:
+        words = [word.strip(".") for word in _WORD_PATTERN.findall(phrase.lower())]
+        words = [word for word in words if word and word not in STOPWORDS]
+        key = frozenset(words)
+        if key and key not in seen:
+            seen.add(key)
+            unique.append((phrase, section))
+            word_lists.append(words)
+    if not unique:
+        return []
+
+    vocabulary = {}
+    rows = np.repeat(np.arange(len(word_lists)), [len(words) for words in word_lists])
+    columns = np.fromiter((vocabulary.setdefault(word, len(vocabulary)) for words in word_lists for word in words),
+                          dtype=np.int64, count=len(rows))
+    presence = np.zeros((len(word_lists), len(vocabulary)), dtype=np.float32)
+    presence[rows, columns] = 1.0
+
+    words = list(vocabulary)
+    document_frequency = presence.sum(axis=0)
+    inverse_frequency = np.log(len(word_lists) / document_frequency)
+    is_cue = np.fromiter((word in REQUIREMENT_CUES for word in words), dtype=np.float32, count=len(words))
+    word_counts = presence.sum(axis=1)
+
+    specificity = presence @ inverse_frequency / word_counts
+    cues = presence @ is_cue
+    has_number = np.fromiter((any(char.isdigit() for char in phrase) for phrase, _ in unique),
+                             dtype=np.float32, count=len(unique))
+    in_requirements = np.fromiter((section == "requirements" for _, section in unique),
+                                  dtype=bool, count=len(unique))
+    scores = 3 * cues + has_number + specificity + SECTION_BONUS * in_requirements
+
+    qualified = (cues > 0) | in_requirements
+    if qualified.any():
+        scores[~qualified] = -np.inf
+        count = min(count, int(qualified.sum()))
+    best = np.sort(np.argsort(-scores, kind="stable")[:count])
+    return [unique[index][0] for index in best]
+
+
+def _guess_company_and_title(text, title, headings):
+    fields = {}
+    for field, pattern in _LABEL_PATTERNS.items():
+        match = pattern.search(text)
+        if match:
+            fields[field] = match.group(1)
+
+    # Page titles and first headings often read "Data Engineer at Acme" or "Data Engineer - Acme"
+    for line in [title, *headings[:1]]:
+        match = _TITLE_AT_COMPANY.match(line or '')
+        if match:
+            fields.setdefault('job_title', match.group(1).strip())
+            fields.setdefault('company_name', match.group(2).strip())
+    if 'job_title' not in fields and headings:
+        fields['job_title'] = headings[0]
+
+    if 'company_name' not in fields:
+        for pattern in _COMPANY_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                fields['company_name'] = match.group(1)
+                break
+    return fields
+
+
+def extract_posting(path):
+    """
+    Turn a saved job posting into a job_details record.
+
+    Args:
+        path (str): A .txt, .md or .html file
+
+    Returns:
+        dict: company_name, job_title, job_description (requirement phrases separated
+            by semicolons), industry (left empty) and source_file
+    """
+    with open(path, 'r', encoding='utf-8', errors='replace') as file:
+        content = file.read()
+
+    extension = os.path.splitext(path)[1].lower()
+    title = ''
+    if extension in ('.html', '.htm'):
+        text, title, headings = html_to_text(content)
+    elif extension in ('.md', '.markdown'):
+        text, headings = markdown_to_text(content)
+    else:
+        text, headings = content, []
+        # The first short line of a plain text posting is usually its title
+        first_line = next((line.strip() for line in text.splitlines() if line.strip()), '')
+        if len(first_line.split()) <= 12:
+            headings = [first_line]
+
+    fields = _guess_company_and_title(text, title, headings)
+    requirements = top_requirements(candidate_phrases(text, headings))
+    return {
+        'company_name': fields.get('company_name', ''),
+        'job_title': fields.get('job_title', ''),
+        'job_description': "; ".join(requirement.replace(";", ",") for requirement in requirements),
+        'industry': '',
+        'source_file': path,
+    }
+
+
+def _extract_item(path):
+    """Process-pool entry point: never raises, so one bad file doesn't stop the run"""
+    try:
+        return path, extract_posting(path), None
+    except Exception as e:
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def iter_posting_files(directory):
+    """Yield supported posting files under directory, walking it lazily in sorted order"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                yield os.path.join(root, name)
+
+
+def ingest_directory(directory, workers=None, max_pending=None, industry_index=None):
+    """
+    Stream a directory of saved postings into job_details records.
+
+    Files are parsed in worker processes and records are yielded as they
+    finish, with only a bounded window of files in flight, so a large corpus
+    never has to fit in memory.
+
+    Args:
+        directory (str): Directory searched recursively for .txt, .md and .html files
+        workers (int): Number of worker processes (default: number of CPU cores; 0 to parse in this process)
+        max_pending (int): Maximum number of files submitted but not yet parsed (default: 4 per worker)
+        industry_index (IndustryIndex): Optional index used to fill in the industry of known companies
+
+    Yields:
+        dict: One job_details record per posting, in completion order
+    """
+    def finish(path, record, error):
+        if error:
+            print(f"Skipping {path}: {error}")
+            return None
+        if not record['job_description'] and not record['job_title']:
+            print(f"Skipping {path}: no job title or requirements found")
+            return None
+        if industry_index is not None and record['company_name']:
+            industries = industry_index.lookup(record['company_name'])
+            if industries:
+                record['industry'] = industries[0]
+        return record
+
+    paths = iter_posting_files(directory)
+    if workers == 0:
+        for path in paths:
+            record = finish(*_extract_item(path))
+            if record is not None:
+                yield record
+        return
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for path in paths:
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    record = finish(*future.result())
+                    if record is not None:
+                        yield record
+            pending.add(pool.submit(_extract_item, path))
+
+        for future in as_completed(pending):
+            record = finish(*future.result())
+            if record is not None:
+                yield record
+
+
+def main(argv=None):
+    from config import load_config
+    from industry_index import get_industry_index
+
+    parser = argparse.ArgumentParser(description="Extract job_details records from a directory of saved postings.")
+    parser.add_argument("directory", help="Directory of .txt, .md and .html postings")
+    parser.add_argument("--output", default=None, help="JSONL file to write (default: standard output)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes (default: number of CPU cores; 0 to parse in this process)")
+    args = parser.parse_args(argv)
+
+    records = ingest_directory(args.directory, args.workers, industry_index=get_industry_index(load_config()))
+    output = open(args.output, 'w') if args.output else sys.stdout
+    count = 0
+    try:
+        for record in records:
+            output.write(json.dumps(record) + "\n")
+            count += 1
+    finally:
+        if args.output:
+            output.close()
+            print(f"Wrote {count} postings to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
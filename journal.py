@@ -0,0 +1,128 @@
+import hashlib
+import json
+import os
+import threading
+
+PENDING = "pending"
+GENERATED = "generated"
+RENDERED = "rendered"
+
+
+def job_key(job_details, template=None, occurrence=0):
+    """
+    Identify a posting within a batch, independent of its position in the input.
+
+    Args:
+        job_details (dict): The complete job details, including the applicant profile
+        template (str): The batch template, or None
+        occurrence (int): Number of identical postings earlier in the same batch
+
+    Returns:
+        str: Hex SHA-256 digest of the job details, template and occurrence
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(job_details, sort_keys=True).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update((template or '').encode('utf-8'))
+    if occurrence:
+        digest.update(f"\0{occurrence}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _write_atomically(path, text):
+    """Write a file so that a crash leaves either the old or the new content, never a mix"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_path, path)
+
+
+class BatchJournal:
+    """
+    Crash-safe record of where each posting of a batch run stands.
+
+    Every posting moves from pending to generated (the letter text is stored)
+    to rendered (its output files are written). State changes are appended
+    to a JSON lines log and synced to disk before the run moves on, and
+    letters are written atomically, so after a crash a new run can skip
+    rendered postings and render generated ones without calling the model again.
+
+    Args:
+        directory (str): Directory holding the journal log and the generated letters
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, "journal.jsonl")
+        self.letters_dir = os.path.join(directory, "letters")
+        os.makedirs(self.letters_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries = {}
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r') as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A crash mid-write can leave a partial last line; the state before it still holds
+                        continue
+                    entry = self._entries.setdefault(record["key"], {})
+                    entry.update({field: value for field, value in record.items() if field != "key"})
+
+        # Compact the log to one line per posting, so it doesn't grow across restarts
+        _write_atomically(self.path, "".join(
+            json.dumps({"key": key, **entry}) + "\n" for key, entry in self._entries.items()))
+        self._file = open(self.path, 'a')
+
+    def _append(self, key, **fields):
+        with self._lock:
+            self._entries.setdefault(key, {}).update(fields)
+            self._file.write(json.dumps({"key": key, **fields}) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def state(self, key):
+        """Return the state of a posting, or None if the journal has not seen it"""
+        return self._entries.get(key, {}).get("state")
+
+    def name(self, key):
+        """Return the output base filename recorded for a posting, or None"""
+        return self._entries.get(key, {}).get("name")
+
+    def mark_pending(self, key, name):
+        """Record that a posting is about to be generated, with its output base filename"""
+        self._append(key, state=PENDING, name=name)
+
+    def mark_generated(self, key, cover_letter):
+        """Store a generated letter, then record the posting as generated"""
+        # The letter is on disk before the state says so, so "generated" always has a letter to load
+        _write_atomically(os.path.join(self.letters_dir, f"{key}.txt"), cover_letter)
+        self._append(key, state=GENERATED)
+
+    def mark_rendered(self, key, formats):
+        """Record that the output files of a posting are written in the given formats"""
+        self._append(key, state=RENDERED, formats=sorted(formats))
+
+    def formats(self, key):
+        """Return the output formats a rendered posting was written in"""
+        return tuple(self._entries.get(key, {}).get("formats", ()))
+
+    def letter(self, key):
+        """Return the stored letter of a generated or rendered posting"""
+        with open(os.path.join(self.letters_dir, f"{key}.txt"), 'r') as file:
+            return file.read()
+
+    def counts(self):
+        """Return the number of postings in each state"""
+        counts = {PENDING: 0, GENERATED: 0, RENDERED: 0}
+        with self._lock:
+            for entry in self._entries.values():
+                counts[entry["state"]] += 1
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._file.close()
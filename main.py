@@ -1,17 +1,26 @@
+import time
+
 from user_input import get_user_input
-from generate_CL import generate_cover_letter
-from pdf_export import export_to_pdf
+from generate_CL import stream_cover_letter
 from template import load_template_from_file
 from config import load_config
+from metrics import metrics
+from model_pool import warm_up_in_background
+from archive import get_letter_archive
 
-load_config()
+config = load_config()
 
 def main():
     # Print welcome message
     print("Welcome to the Cover Letter Generator!")
 
+    # Open the model connection while the user is still typing
+    if config["WARM_UP"]:
+        warm_up_in_background()
+
     # Get job details with industry selection
-    job_details = get_user_input()
+    with metrics.timer("interactive_input"):
+        job_details = get_user_input()
 
     # Ask if user wants to use existing template
     template_choice = input("Do you want to use an existing template? (yes/no): ").lower()
@@ -33,14 +42,57 @@ def main():
                 print("Please create a template file named 'template.txt' in the same directory.")
                 return    
     
+    # Offer the closest earlier letter as the starting point for this one
+    archive = get_letter_archive(config) if config["ARCHIVE_ENABLED"] else None
+    base_letter = None
+    duplicate = None
+    if archive is not None:
+        # numpy is only imported once the archive is in use
+        from posting_index import adapt_letter, find_near_duplicate, get_posting_index
+        duplicate, similarity = find_near_duplicate(job_details, config, template)
+        closest = None if duplicate is not None else archive.closest(job_details, template)
+        if duplicate is not None:
+            adapt_choice = input(f"This posting is {similarity:.0%} similar to your earlier application to "
+                                 f"{duplicate['company_name']} ({duplicate['job_title']}). "
+                                 f"Adapt that letter instead of writing a new one? (yes/no): ").lower()
+            if adapt_choice != 'yes':
+                duplicate = None
+        elif closest is not None:
+            reuse_choice = input(f"Start from your earlier letter for {closest['company_name']} "
+                                 f"({closest['job_title']})? (yes/no): ").lower()
+            if reuse_choice == 'yes':
+                base_letter = closest['cover_letter']
+
     # Generate cover letter
     try:
-        cover_letter = generate_cover_letter(template, job_details)
-        
         print("\nGenerated Cover Letter:")
         print("=" * 50)
-        print(cover_letter)
+        
+        # Print the letter as it is generated instead of waiting for the full response
+        timings = {}
+        if duplicate is not None:
+            # Only the paragraphs built on changed requirements go back to the model
+            start = time.perf_counter()
+            cover_letter = adapt_letter(duplicate, job_details, template)
+            timings['time_to_first_token'] = timings['total_time'] = time.perf_counter() - start
+            print(cover_letter, end="")
+        else:
+            chunks = []
+            for chunk in stream_cover_letter(template, job_details, timings, base_letter=base_letter):
+                print(chunk, end="", flush=True)
+                chunks.append(chunk)
+            cover_letter = "".join(chunks)
+        
+        print()
         print("=" * 50)
+        print(f"First text after {timings.get('time_to_first_token', 0):.2f}s, "
+              f"complete after {timings.get('total_time', 0):.2f}s")
+
+        if archive is not None:
+            letter_id = archive.add(cover_letter, job_details, template, config["DEFAULT_MODEL"], timings)
+            posting_index = get_posting_index(config)
+            posting_index.add(letter_id, job_details)
+            posting_index.save()
         
         # Ask if user wants to save the cover letter
         save_option = input("Do you want to save this cover letter? (yes/no): ").lower()
@@ -65,7 +117,7 @@ def main():
             # Save as text file
             if format_choice in [1, 3]:
                 txt_filename = f"{base_filename}.txt"
-                with open(txt_filename, 'w') as file:
+                with metrics.timer("write_text"), open(txt_filename, 'w') as file:
                     file.write(cover_letter)
                 print(f"Cover letter saved to {txt_filename}")
             
@@ -73,6 +125,8 @@ def main():
             if format_choice in [2, 3]:
                 pdf_filename = f"{base_filename}.pdf"
                 try:
+                    # reportlab is only imported when a PDF is actually requested
+                    from pdf_export import export_to_pdf
                     export_to_pdf(cover_letter, job_details, pdf_filename)
                 except Exception as e:
                     print(f"Failed to create PDF: {e}")
@@ -82,5 +136,7 @@ def main():
         print(f"An error occurred: {e}")
         print("Please check your API key and internet connection.")
 
+    metrics.export_configured()
+
 if __name__ == "__main__":
     main()
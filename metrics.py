@@ -0,0 +1,193 @@
+import bisect
+import json
+import os
+import threading
+import time
+
+from config import metrics_settings
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot counts values above every bound
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Return (upper bound, cumulative count) pairs, ending with +Inf"""
+        pairs = []
+        running = 0
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            running += count
+            pairs.append((bound, running))
+        return pairs
+
+
+class _NullTimer:
+    """Timer used while metrics are disabled; does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.name, time.perf_counter() - self.start, LATENCY_BUCKETS, **self.labels)
+        if exc_type is not None:
+            self.registry.increment("errors_total", **self.labels)
+        return False
+
+
+class Metrics:
+    """Counters and histograms for pipeline stages and model calls"""
+
+    def __init__(self, enabled=None):
+        # None reads METRICS_ENABLED on first use, so importing this module needs no configuration
+        self._enabled = enabled
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    @property
+    def enabled(self):
+        if self._enabled is None:
+            self._enabled = metrics_settings()["METRICS_ENABLED"]
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        self._enabled = value
+
+    @staticmethod
+    def _key(name, labels):
+        return (name, tuple(sorted(labels.items())))
+
+    def timer(self, stage, **labels):
+        """
+        Time a block of code as 'stage_seconds{stage=...}'; exceptions also count as errors.
+
+        Args:
+            stage (str): Stage name, e.g. "generate_cover_letter"
+            **labels: Extra labels, e.g. model="gemini-1.5-pro"
+
+        Returns:
+            A context manager
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, "stage_seconds", {"stage": stage, **labels})
+
+    def increment(self, name, amount=1, **labels):
+        """Add amount to a counter"""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, buckets=SIZE_BUCKETS, **labels):
+        """Record a value in a histogram, e.g. a prompt size in characters"""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def snapshot(self):
+        """Return every counter and histogram as a list of JSON-serializable records"""
+        with self._lock:
+            records = [
+                {"type": "counter", "name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            for (name, labels), histogram in sorted(self._histograms.items()):
+                records.append({
+                    "type": "histogram",
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": [["+Inf" if bound == float("inf") else bound, count]
+                                for bound, count in histogram.cumulative()],
+                })
+        return records
+
+    def export_jsonl(self, path):
+        """Append the current metrics to a JSON lines file, one record per series"""
+        timestamp = time.time()
+        with open(path, 'a') as file:
+            for record in self.snapshot():
+                file.write(json.dumps({"timestamp": timestamp, **record}) + "\n")
+
+    def export_prometheus(self, path):
+        """Write the current metrics in the Prometheus textfile-collector format"""
+        def format_labels(labels, extra=None):
+            items = list(labels.items()) + (list(extra.items()) if extra else [])
+            if not items:
+                return ""
+            return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+        lines = []
+        declared = set()
+        for record in self.snapshot():
+            name = f"cover_letter_{record['name']}"
+            if name not in declared:
+                lines.append(f"# TYPE {name} {record['type']}")
+                declared.add(name)
+            if record["type"] == "counter":
+                lines.append(f"{name}{format_labels(record['labels'])} {record['value']}")
+            else:
+                for bound, count in record["buckets"]:
+                    lines.append(f"{name}_bucket{format_labels(record['labels'], {'le': bound})} {count}")
+                lines.append(f"{name}_sum{format_labels(record['labels'])} {record['sum']}")
+                lines.append(f"{name}_count{format_labels(record['labels'])} {record['count']}")
+
+        # Write to a temporary file first so the collector never reads a partial file
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    def export_configured(self):
+        """Export to the paths set in METRICS_JSONL_PATH and METRICS_PROMETHEUS_PATH, if any"""
+        if not self.enabled:
+            return
+        settings = metrics_settings()
+        if settings["METRICS_JSONL_PATH"]:
+            self.export_jsonl(settings["METRICS_JSONL_PATH"])
+        if settings["METRICS_PROMETHEUS_PATH"]:
+            self.export_prometheus(settings["METRICS_PROMETHEUS_PATH"])
+
+
+# Shared registry used by every module; enabled by METRICS_ENABLED
+metrics = Metrics()
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import threading
+import time
+
+from backends import FakeBackend, GeminiBackend
+from config import get_genai, load_config
+from hedging import get_hedged_caller
+from metrics import metrics
+from prompt_budget import estimate_tokens
+from rate_limiter import get_rate_limiter
+from usage import current_labels, get_usage_ledger, usage_counts
+
+config = load_config()
+
+# Tokens reserved for the answer when checking the tokens-per-minute limit
+EXPECTED_OUTPUT_TOKENS = 800
+
+# One GenerativeModel per (model name, generation config); each keeps its client connection open
+_models = {}
+_models_lock = threading.Lock()
+
+# Backend that answers generate_content(); chosen by config["MODEL_BACKEND"] unless set_backend() is called
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _pool_key(model_name, generation_config):
+    """Build a hashable key for a model name and generation config"""
+    if generation_config is None:
+        return (model_name, None)
+    return (model_name, json.dumps(generation_config, sort_keys=True, default=str))
+
+
+def get_model(model_name=None, generation_config=None):
+    """
+    Return a shared GenerativeModel, creating it on first use.
+
+    The lock is only held while looking up or creating the model, never while
+    a request is in flight, so it is safe to call from worker threads and from
+    coroutines alike.
+
+    Args:
+        model_name (str): The Gemini model name (default: config["DEFAULT_MODEL"])
+        generation_config (dict): Optional generation settings baked into the model
+
+    Returns:
+        GenerativeModel: The pooled model instance
+    """
+    model_name = model_name or config["DEFAULT_MODEL"]
+    key = _pool_key(model_name, generation_config)
+    with _models_lock:
+        model = _models.get(key)
+        if model is None:
+            model = get_genai().GenerativeModel(model_name, generation_config=generation_config)
+            _models[key] = model
+        return model
+
+
+def get_backend():
+    """
+    Return the model backend in use, creating it from the configuration on first use.
+
+    MODEL_BACKEND=gemini (the default) talks to the API; MODEL_BACKEND=fake
+    answers locally using the FAKE_* latency, jitter, failure rate and size settings.
+    """
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if config["MODEL_BACKEND"] == "fake":
+                _backend = FakeBackend(
+                    latency=config["FAKE_LATENCY"],
+                    jitter=config["FAKE_JITTER"],
+                    failure_rate=config["FAKE_FAILURE_RATE"],
+                    response_words=config["FAKE_RESPONSE_WORDS"],
+                    tail_rate=config["FAKE_TAIL_RATE"],
+                    tail_latency=config["FAKE_TAIL_LATENCY"],
+                )
+            else:
+                _backend = GeminiBackend(get_model)
+        return _backend
+
+
+def set_backend(backend):
+    """Replace the model backend, e.g. with a FakeBackend for benchmarks"""
+    global _backend
+    with _backend_lock:
+        _backend = backend
+
+
+def generate_content(prompt, model_name=None, generation_config=None, stream=False, timeout=None):
+    """
+    Send a prompt to the model backend, within the shared rate limits.
+
+    Quota (429) and server (5xx) errors are retried with jittered exponential
+    backoff. Streamed calls are only retried if opening the stream fails.
+
+    Each attempt has a deadline; an attempt that misses it raises
+    DeadlineExceeded and is retried. A call slower than the configured
+    percentile of recent calls is hedged with a duplicate request, within
+    the hedge budget. Streamed calls are never hedged and their deadline
+    only covers opening the stream.
+
+    Args:
+        prompt (str): The prompt to send
+        model_name (str): The Gemini model name (default: config["DEFAULT_MODEL"])
+        generation_config (dict): Optional generation settings
+        stream (bool): Return a streamed response instead of waiting for the full text
+        timeout (float): Deadline per attempt in seconds (default: config["MODEL_CALL_TIMEOUT"]; 0 for none)
+
+    Returns:
+        GenerateContentResponse: The SDK response (or the backend's equivalent)
+    """
+    model_name = model_name or config["DEFAULT_MODEL"]
+    backend = get_backend()
+    limiter = get_rate_limiter(config)
+    ledger = get_usage_ledger(config)
+    caller = get_hedged_caller(config)
+    timeout = config["MODEL_CALL_TIMEOUT"] if timeout is None else timeout
+    prompt_tokens = estimate_tokens(prompt)
+    estimated_tokens = prompt_tokens + EXPECTED_OUTPUT_TOKENS
+    # Requests run on the hedged caller's threads, which don't see this context's labels
+    call_labels = current_labels()
+    metrics.observe("prompt_chars", len(prompt), model=model_name)
+
+    def send():
+        sent = time.perf_counter()
+        response = backend.generate(prompt, model_name, generation_config, stream, timeout)
+        if not stream:
+            # Recorded by the request itself, so a hedged request that loses is still accounted for
+            _record_usage(ledger, response, model_name, time.perf_counter() - sent, call_labels, backend.name)
+        return response
+
+    def send_hedge(settled):
+        # A duplicate is a request like any other: it takes budget and rate limits of its own,
+        # but is never retried and is skipped if the budget only fits it after calls in flight
+        hedge_reservation = ledger.reserve(model_name, prompt_tokens, EXPECTED_OUTPUT_TOKENS, wait=False,
+                                           backend=backend.name)
+        try:
+            return limiter.call(lambda: None if settled.is_set() else send(), estimated_tokens, max_retries=0)
+        finally:
+            ledger.release(hedge_reservation)
+
+    # Fails before sending anything if the call could take the run over its budget
+    reservation = ledger.reserve(model_name, prompt_tokens, EXPECTED_OUTPUT_TOKENS, backend=backend.name)
+    start = time.perf_counter()
+    try:
+        with metrics.timer("model_call", model=model_name):
+            response = limiter.call(
+                lambda: caller.call(send, model_name, timeout, hedge=not stream, hedge_function=send_hedge),
+                estimated_tokens=estimated_tokens)
+    except Exception:
+        ledger.release(reservation)
+        raise
+
+    if stream:
+        return _record_stream_usage(response, ledger, reservation, model_name, start, call_labels, backend.name)
+
+    ledger.release(reservation)
+    if metrics.enabled:
+        try:
+            metrics.observe("response_chars", len(response.text), model=model_name)
+        except ValueError:
+            # Blocked responses have no text
+            pass
+    return response
+
+
+def _record_usage(ledger, response, model_name, latency, call_labels, backend_name):
+    counts = usage_counts(response)
+    if counts is None:
+        return
+    ledger.record(model_name, *counts, latency, call_labels, backend_name)
+    metrics.increment("tokens_total", counts[0], model=model_name, kind="prompt")
+    metrics.increment("tokens_total", counts[1], model=model_name, kind="output")
+
+
+def _record_stream_usage(chunks, ledger, reservation, model_name, start, call_labels, backend_name):
+    """Pass a stream through and record its usage once it ends; the last chunk carries the totals"""
+    last = None
+    try:
+        for chunk in chunks:
+            if getattr(chunk, "usage_metadata", None) is not None:
+                last = chunk
+            yield chunk
+        if last is not None:
+            _record_usage(ledger, last, model_name, time.perf_counter() - start, call_labels, backend_name)
+    finally:
+        ledger.release(reservation)
+
+
+async def generate_content_async(prompt, model_name=None, generation_config=None, stream=False, timeout=None):
+    """Async counterpart of generate_content(); waits for rate limits on a worker thread"""
+    return await asyncio.to_thread(generate_content, prompt, model_name, generation_config, stream, timeout)
+
+
+def warm_up(model_names=None, send_request=True):
+    """
+    Create pooled models ahead of time so the first real request skips the setup.
+
+    Args:
+        model_names (list): Models to warm up (default: config["DEFAULT_MODEL"] and config["SUGGEST_MODEL"])
+        send_request (bool): Also send a token-count request, which opens the connection without generating text
+    """
+    backend = get_backend()
+    for model_name in model_names or [config["DEFAULT_MODEL"], config["SUGGEST_MODEL"]]:
+        if isinstance(backend, GeminiBackend):
+            get_model(model_name)
+        if send_request:
+            try:
+                backend.warm_up(model_name)
+            except Exception as e:
+                print(f"Warm-up request for {model_name} failed: {e}")
+
+
+def warm_up_in_background(model_names=None):
+    """Run warm_up() on a daemon thread so it overlaps with whatever happens next"""
+    thread = threading.Thread(target=warm_up, args=(model_names,), daemon=True)
+    thread.start()
+    return thread
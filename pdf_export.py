@@ -1,11 +1,19 @@
+import io
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, KeepTogether, Flowable
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Frame, SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, KeepTogether, Flowable
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.units import inch
 
+from metrics import metrics
+
 # Custom Flowable for horizontal line
 class HorizontalLine(Flowable):
     def __init__(self, width, thickness=1, color=colors.black):
@@ -20,6 +28,128 @@ class HorizontalLine(Flowable):
         self.canv.line(0, 0, self.width, 0)
 
 
+class PdfRenderer:
+    """
+    Render cover letters to PDF with fonts and paragraph styles prepared once.
+
+    Create one renderer per process (see get_renderer()) and reuse it for any
+    number of letters.
+    """
+
+    def __init__(self):
+        # Try to register Times New Roman font
+        try:
+            pdfmetrics.registerFont(TTFont('Times-New-Roman', 'times.ttf'))
+            pdfmetrics.registerFont(TTFont('Times-New-Roman-Bold', 'timesbd.ttf'))
+            self.font_name = 'Times-New-Roman'
+        except:
+            print("Times New Roman font not found, using default fonts.")
+            self.font_name = 'Times-Roman'  # Default fallback in ReportLab
+
+        # Custom styles to match the description
+        self.title_style = ParagraphStyle(
+            'Title',
+            fontName=self.font_name,
+            fontSize=24,
+            alignment=1,  # Center alignment
+            spaceAfter=10
+        )
+
+        self.contact_style = ParagraphStyle(
+            'Contact',
+            fontName=self.font_name,
+            fontSize=11,
+            alignment=1,  # Center alignment
+            spaceAfter=15
+        )
+
+        self.normal_style = ParagraphStyle(
+            'Normal',
+            fontName=self.font_name,
+            fontSize=11,
+            leading=14,  # Line spacing
+            spaceBefore=6,
+            spaceAfter=6
+        )
+
+    def build_story(self, cover_letter_text, job_details, width):
+        """
+        Build the flowables for one letter: name, horizontal line, contact block and body.
+
+        Args:
+            cover_letter_text (str): The generated cover letter text
+            job_details (dict): Dictionary containing job details
+            width (float): The usable page width for the horizontal line
+
+        Returns:
+            list: ReportLab flowables
+        """
+        story = []
+
+        # Add name as title
+        story.append(Paragraph(job_details['your_name'], self.title_style))
+        story.append(Spacer(1, 5))  # Small space after title
+
+        # Add horizontal line
+        story.append(HorizontalLine(width))
+        story.append(Spacer(1, 5))  # Small space after line
+
+        # Add contact information
+        contact_info = f"{job_details['city']}, {job_details['country']} | {job_details['phone']} | {job_details['email']}"
+        story.append(Paragraph(contact_info, self.contact_style))
+
+        # Parse the cover letter into paragraphs
+        paragraphs = [p for p in cover_letter_text.split('\n\n') if p.strip()]
+
+        # Process the cover letter paragraphs
+        for paragraph in paragraphs:
+            paragraph = paragraph.strip()
+            if paragraph:
+                story.append(Paragraph(paragraph, self.normal_style))
+
+        return story
+
+    def render(self, cover_letter_text, job_details, output, title=None):
+        """
+        Render one cover letter.
+
+        Args:
+            cover_letter_text (str): The generated cover letter text
+            job_details (dict): Dictionary containing job details
+            output (str or file): The PDF filename, or a binary file-like object to write into
+            title (str): The document title (default: the filename)
+        """
+        title = title or (output if isinstance(output, str) else job_details.get('company_name', ''))
+
+        # Create a PDF document
+        doc = SimpleDocTemplate(output, pagesize=letter,
+                               rightMargin=0.5*inch, leftMargin=0.5*inch,
+                               topMargin=0.2*inch, bottomMargin=0.2*inch)
+
+        # Set the document title
+        doc.title = title  # This sets the internal document metadata
+
+        def on_first_page(canvas, doc):
+            canvas.setTitle(title)  # Set PDF title
+            canvas.setAuthor(job_details.get('your_name', ''))  # Optional: Set author
+
+        # Build the PDF
+        doc.build(self.build_story(cover_letter_text, job_details, doc.width), onFirstPage=on_first_page)
+
+
+_renderer = None
+_renderer_lock = threading.Lock()
+
+
+def get_renderer():
+    """Return the process-wide PdfRenderer, registering fonts on first use"""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            _renderer = PdfRenderer()
+        return _renderer
+
+
 def export_to_pdf(cover_letter_text, job_details, output_filename):
     """
     Export the cover letter to a formatted PDF document according to specified format.
@@ -33,83 +163,207 @@ def export_to_pdf(cover_letter_text, job_details, output_filename):
     if not output_filename.lower().endswith('.pdf'):
         output_filename += '.pdf'
     
-    # Create a PDF document
-    doc = SimpleDocTemplate(output_filename, pagesize=letter, 
-                           rightMargin=0.5*inch, leftMargin=0.5*inch,
-                           topMargin=0.2*inch, bottomMargin=0.2*inch)
+    with metrics.timer("export_to_pdf"):
+        get_renderer().render(cover_letter_text, job_details, output_filename)
     
-    # Set the document title
-    doc.title = output_filename  # This sets the internal document metadata
+    print(f"PDF cover letter successfully exported to {output_filename}")
 
-    def on_first_page(canvas, doc):
-        canvas.setTitle(output_filename)  # Set PDF title
-        canvas.setAuthor(job_details.get('your_name', ''))  # Optional: Set author
 
-    
-    # Try to register Times New Roman font
+def render_pdf_bytes(cover_letter_text, job_details, title=None):
+    """
+    Render the cover letter to PDF in memory, without writing a file.
+
+    Args:
+        cover_letter_text (str): The generated cover letter text
+        job_details (dict): Dictionary containing job details
+        title (str): The document title (default: the company name)
+
+    Returns:
+        bytes: The PDF document
+    """
+    buffer = io.BytesIO()
+    with metrics.timer("export_to_pdf"):
+        get_renderer().render(cover_letter_text, job_details, buffer, title=title)
+    return buffer.getvalue()
+
+
+class MergedPdfWriter:
+    """
+    Append cover letters to one PDF as they arrive, one or more pages per letter.
+
+    Each letter starts on a new page and gets an outline (bookmark) entry.
+    Only the flowables of the letter being added are kept, but ReportLab's
+    Canvas holds every finished page, compressed, until the file is saved:
+    about 7 KB per letter, so a single merged file grows linearly in memory
+    (about 8 MB for 1200 letters). With letters_per_file, the output is split
+    into numbered files (letters-001.pdf, letters-002.pdf, ...) and each one
+    is saved when full, which bounds memory by letters_per_file instead.
+
+    Args:
+        output_filename (str): The merged PDF, or the base name of the numbered files
+        title (str): Document title (default: the file name)
+        author (str): Document author
+        letters_per_file (int): Start a new numbered file after this many letters (0 for one file)
+
+    Example:
+        with MergedPdfWriter("letters.pdf") as writer:
+            for cover_letter, job_details in letters:
+                writer.add_letter(cover_letter, job_details)
+    """
+
+    def __init__(self, output_filename, title=None, author='', letters_per_file=0):
+        if not output_filename.lower().endswith('.pdf'):
+            output_filename += '.pdf'
+        self.output_filename = output_filename
+        self.title = title
+        self.author = author
+        self.letters_per_file = letters_per_file
+        self.renderer = get_renderer()
+        self.files = []
+        self.canvas = None
+        self.letters = 0
+        self._letters_in_file = 0
+
+        # Same page geometry as export_to_pdf()
+        self.left_margin = self.right_margin = 0.5*inch
+        self.top_margin = self.bottom_margin = 0.2*inch
+        page_width, self.page_height = letter
+        self.width = page_width - self.left_margin - self.right_margin
+        self.height = self.page_height - self.top_margin - self.bottom_margin
+
+    def _open_canvas(self):
+        if self.letters_per_file:
+            stem = self.output_filename[:-len('.pdf')]
+            filename = f"{stem}-{len(self.files) + 1:03d}.pdf"
+        else:
+            filename = self.output_filename
+        self.files.append(filename)
+        self.canvas = Canvas(filename, pagesize=letter, pageCompression=1)
+        self.canvas.setTitle(self.title or filename)
+        self.canvas.setAuthor(self.author)
+        self.canvas.showOutline()
+        self._letters_in_file = 0
+
+    def _new_frame(self):
+        return Frame(self.left_margin, self.bottom_margin, self.width, self.height)
+
+    def add_letter(self, cover_letter_text, job_details, bookmark_title=None):
+        """
+        Lay out one letter on new pages of the merged document.
+
+        Args:
+            cover_letter_text (str): The generated cover letter text
+            job_details (dict): Dictionary containing job details
+            bookmark_title (str): Outline entry text (default: "<company> - <job title>")
+        """
+        story = self.renderer.build_story(cover_letter_text, job_details, self.width)
+
+        if self.canvas is not None and self.letters_per_file and self._letters_in_file >= self.letters_per_file:
+            # Saving releases the finished pages, so memory stays bounded by letters_per_file
+            self.canvas.save()
+            self.canvas = None
+        if self.canvas is None:
+            self._open_canvas()
+
+        key = f"letter-{self.letters}"
+        self.canvas.bookmarkPage(key)
+        title = bookmark_title or " - ".join(
+            part for part in (job_details.get('company_name'), job_details.get('job_title')) if part
+        ) or f"Letter {self.letters + 1}"
+        self.canvas.addOutlineEntry(title, key, level=0)
+
+        while story:
+            remaining = len(story)
+            self._new_frame().addFromList(story, self.canvas)
+            if story and len(story) == remaining:
+                # Nothing fit on an empty page; drop the oversized flowable instead of looping forever
+                print(f"Skipping content that does not fit on a page in letter {self.letters + 1}.")
+                story.pop(0)
+            self.canvas.showPage()
+
+        self.letters += 1
+        self._letters_in_file += 1
+
+    def close(self):
+        """Finish and write the merged document"""
+        if self.canvas is None:
+            # No letter was added; still write a valid (empty) document
+            self._open_canvas()
+        self.canvas.save()
+        self.canvas = None
+        if len(self.files) > 1:
+            print(f"Merged PDF with {self.letters} cover letters exported to {len(self.files)} files: "
+                  f"{self.files[0]} ... {self.files[-1]}")
+        else:
+            print(f"Merged PDF with {self.letters} cover letters exported to {self.files[0]}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _init_pdf_worker():
+    """Process pool initializer: register fonts and build styles once per worker"""
+    get_renderer()
+
+
+def render_pdf_item(item):
+    """
+    Render one (cover_letter_text, job_details, output_filename) item in a worker process.
+
+    Returns:
+        tuple: (output_filename, error message or None)
+    """
+    cover_letter_text, job_details, output_filename = item
+    if not output_filename.lower().endswith('.pdf'):
+        output_filename += '.pdf'
     try:
-        pdfmetrics.registerFont(TTFont('Times-New-Roman', 'times.ttf'))
-        pdfmetrics.registerFont(TTFont('Times-New-Roman-Bold', 'timesbd.ttf'))
-        font_name = 'Times-New-Roman'
-    except:
-        print("Times New Roman font not found, using default fonts.")
-        font_name = 'Times-Roman'  # Default fallback in ReportLab
-
-    # Define styles
-    styles = getSampleStyleSheet()
-    
-    # Custom styles to match the description
-    title_style = ParagraphStyle(
-        'Title',
-        fontName=font_name,
-        fontSize=24,
-        alignment=1,  # Center alignment
-        spaceAfter=10
-    )
-    
-    contact_style = ParagraphStyle(
-        'Contact',
-        fontName=font_name,
-        fontSize=11,
-        alignment=1,  # Center alignment
-        spaceAfter=15
-    )
-    
-    normal_style = ParagraphStyle(
-        'Normal',
-        fontName=font_name,
-        fontSize=11,
-        leading=14,  # Line spacing
-        spaceBefore=6,
-        spaceAfter=6
-    )
-    
-    # Prepare the document content
-    story = []
-    
-    # Add name as title
-    story.append(Paragraph(job_details['your_name'], title_style))
-    story.append(Spacer(1, 5))  # Small space after title
-    
-    # Add horizontal line
-    story.append(HorizontalLine(doc.width))
-    story.append(Spacer(1, 5))  # Small space after line
-    
-    # Add contact information
-    contact_info = f"{job_details['city']}, {job_details['country']} | {job_details['phone']} | {job_details['email']}"
-    story.append(Paragraph(contact_info, contact_style))
-    
-    # Parse the cover letter into paragraphs
-    paragraphs = [p for p in cover_letter_text.split('\n\n') if p.strip()]
-    
-    # Process the cover letter paragraphs
-    for paragraph in paragraphs:
-        paragraph = paragraph.strip()
-        if paragraph:
-            story.append(Paragraph(paragraph, normal_style))
-    
-    # Build the PDF
-    doc.build(story, onFirstPage=on_first_page)
-    
-    print(f"PDF cover letter successfully exported to {output_filename}")
+        get_renderer().render(cover_letter_text, job_details, output_filename)
+        return output_filename, None
+    except Exception as e:
+        return output_filename, f"{type(e).__name__}: {e}"
+
+
+def create_pdf_pool(workers=None):
+    """
+    Create a process pool whose workers each hold their own PdfRenderer.
+
+    Args:
+        workers (int): Number of worker processes (default: number of CPU cores)
+
+    Returns:
+        ProcessPoolExecutor: Pool to submit render_pdf_item() calls to
+    """
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_pdf_worker)
+
+
+def export_many_to_pdf(items, workers=None, max_pending=None):
+    """
+    Render many cover letters to PDF in parallel across CPU cores.
+
+    Args:
+        items (iterable): (cover_letter_text, job_details, output_filename) tuples; may be a generator
+        workers (int): Number of worker processes (default: number of CPU cores)
+        max_pending (int): Maximum number of items submitted but not yet finished (default: 4 per worker)
+
+    Yields:
+        tuple: (output_filename, error message or None) in completion order
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 4
+
+    with create_pdf_pool(workers) as pool:
+        pending = set()
+        for item in items:
+            # Keep only a bounded window of items in flight so huge batches don't pile up in memory
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(pool.submit(render_pdf_item, item))
 
+        for future in as_completed(pending):
+            yield future.result()
@@ -0,0 +1,294 @@
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from archive import get_letter_archive, template_hash
+
+# Width of the hashed feature vectors; 1024 float32 columns keep 40,000 postings in about 160 MB
+DIMENSIONS = 1024
+
+# Queries scored against the matrix in one matrix product
+QUERY_BATCH = 256
+
+# Company and title words count this many times more than description words
+HEADER_WEIGHT = 2.0
+
+# Feature namespace and weight per field, so the same word in a title and a description are different features
+FIELD_FEATURES = {
+    'company_name': ('c', HEADER_WEIGHT),
+    'job_title': ('t', HEADER_WEIGHT),
+    'job_description': ('d', 1.0),
+}
+
+# Bumped whenever posting_features() changes, so vectors saved by an older version are rebuilt
+FEATURE_VERSION = 2
+
+_WORD_PATTERN = re.compile(r"[a-z0-9+#]+")
+
+
+def posting_features(job_details):
+    """
+    Turn a posting into weighted word unigram and bigram features.
+
+    Args:
+        job_details (dict): Dictionary containing job details like company, role, etc.
+
+    Returns:
+        dict: Feature string to weight
+    """
+    features = {}
+    for field, (prefix, weight) in FIELD_FEATURES.items():
+        words = _WORD_PATTERN.findall(job_details.get(field, '').lower())
+        grams = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+        for gram in grams:
+            key = f"{prefix}:{gram}"
+            features[key] = features.get(key, 0.0) + weight
+    return features
+
+
+def posting_vector(job_details, dimensions=DIMENSIONS):
+    """
+    Hash a posting into a unit-length vector, so cosine similarity is a dot product.
+
+    Args:
+        job_details (dict): Dictionary containing job details like company, role, etc.
+        dimensions (int): Vector width
+
+    Returns:
+        numpy.ndarray: float32 vector of length dimensions
+    """
+    vector = np.zeros(dimensions, dtype=np.float32)
+    features = posting_features(job_details)
+    if not features:
+        return vector
+
+    hashes = np.fromiter((zlib.crc32(key.encode('utf-8')) for key in features), dtype=np.uint32, count=len(features))
+    weights = np.log1p(np.fromiter(features.values(), dtype=np.float32, count=len(features)))
+    # The top bit picks a sign so colliding features cancel out instead of piling up
+    signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+    np.add.at(vector, hashes % dimensions, signs * weights)
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class PostingIndex:
+    """
+    In-memory matrix of hashed posting vectors, keyed by letter archive id.
+
+    The vectors are derived from the archive, so the file on disk is only a
+    cache: postings archived since the last save are hashed and added on load.
+    """
+
+    def __init__(self, path, archive, dimensions=DIMENSIONS):
+        self.path = path
+        self.archive = archive
+        self.dimensions = dimensions
+        self._lock = threading.Lock()
+        self._matrix = np.zeros((0, dimensions), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._dirty = False
+
+        if os.path.exists(path):
+            with np.load(path) as data:
+                version = int(data["version"]) if "version" in data.files else 1
+                if version == FEATURE_VERSION and data["matrix"].shape[1] == dimensions:
+                    self._matrix = data["matrix"]
+                    self._ids = data["ids"]
+                    self._size = len(self._ids)
+        self.sync()
+
+    def __len__(self):
+        return self._size
+
+    def _append(self, letter_id, vector):
+        if self._size == len(self._matrix):
+            # Grow by doubling so adding one posting stays cheap
+            capacity = max(64, 2 * len(self._matrix))
+            matrix = np.zeros((capacity, self.dimensions), dtype=np.float32)
+            matrix[:self._size] = self._matrix[:self._size]
+            ids = np.zeros(capacity, dtype=np.int64)
+            ids[:self._size] = self._ids[:self._size]
+            self._matrix, self._ids = matrix, ids
+        self._matrix[self._size] = vector
+        self._ids[self._size] = letter_id
+        self._size += 1
+        self._dirty = True
+
+    def sync(self):
+        """Index every archived posting added since the last save; returns how many were added"""
+        with self._lock:
+            last_id = int(self._ids[:self._size].max()) if self._size else 0
+            added = 0
+            for letter_id, job_details in self.archive.postings(after_id=last_id):
+                self._append(letter_id, posting_vector(job_details, self.dimensions))
+                added += 1
+        return added
+
+    def add(self, letter_id, job_details):
+        """Index the posting of a letter that was just archived"""
+        vector = posting_vector(job_details, self.dimensions)
+        with self._lock:
+            self._append(letter_id, vector)
+
+    def search_many(self, jobs):
+        """
+        Find the most similar indexed posting for each of several postings at once.
+
+        Args:
+            jobs (list): List of job_details dictionaries
+
+        Returns:
+            list: One (letter_id, similarity) pair per job, or (None, 0.0) while the index is empty
+        """
+        queries = np.stack([posting_vector(job, self.dimensions) for job in jobs]) if jobs else None
+        results = []
+        with self._lock:
+            if not self._size or queries is None:
+                return [(None, 0.0)] * len(jobs)
+            matrix = self._matrix[:self._size]
+            for start in range(0, len(queries), QUERY_BATCH):
+                scores = matrix @ queries[start:start + QUERY_BATCH].T
+                best = scores.argmax(axis=0)
+                for column, row in enumerate(best):
+                    results.append((int(self._ids[row]), float(scores[row, column])))
+        return results
+
+    def search(self, job_details):
+        """Return (letter_id, similarity) of the most similar indexed posting"""
+        return self.search_many([job_details])[0]
+
+    def save(self):
+        """Write the vectors to disk atomically, if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as file:
+                np.savez(file, matrix=self._matrix[:self._size], ids=self._ids[:self._size],
+                         version=np.int64(FEATURE_VERSION))
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+
+def similarity_matrix(jobs, dimensions=DIMENSIONS):
+    """Cosine similarity of every pair of postings in jobs"""
+    if not jobs:
+        return np.zeros((0, 0), dtype=np.float32)
+    vectors = np.stack([posting_vector(job, dimensions) for job in jobs])
+    return vectors @ vectors.T
+
+
+def group_near_duplicates(jobs, threshold):
+    """
+    Assign every posting that nearly repeats an earlier one in jobs to that earlier posting.
+
+    Args:
+        jobs (list): List of job_details dictionaries
+        threshold (float): Minimum cosine similarity for two postings to count as duplicates
+
+    Returns:
+        dict: Index of each duplicate posting mapped to the index of the first posting it repeats
+    """
+    similarities = similarity_matrix(jobs)
+    leaders = {}
+    for index in range(1, len(jobs)):
+        earlier = similarities[index, :index].copy()
+        # Only postings that are themselves generated can be copied from
+        earlier[list(leaders)] = -1.0
+        best = int(earlier.argmax())
+        if earlier[best] >= threshold:
+            leaders[index] = best
+    return leaders
+
+
+def adapt_letter(record, job_details, template=None, use_cache=True):
+    """
+    Adapt an archived letter to a near-duplicate posting.
+
+    Names, titles and contact details are swapped locally; only paragraphs
+    built on changed requirements are sent back to the model.
+
+    Args:
+        record (dict): Archived letter, from LetterArchive.get()
+        job_details (dict): The new posting's job details
+        template (str): The template of the new letter, or None
+
+    Returns:
+        str: The adapted cover letter
+    """
+    from revise import RevisableLetter
+
+    letter = RevisableLetter(record['cover_letter'], record['job_details'], template)
+    return letter.revise(job_details, use_cache=use_cache)
+
+
+def find_near_duplicate(job_details, config, template=None):
+    """
+    Look up an archived letter written for a near-duplicate of this posting.
+
+    Args:
+        job_details (dict): Dictionary containing job details like company, role, etc.
+        config (dict): The shared configuration
+        template (str): The template the new letter will use, or None
+
+    Returns:
+        tuple: (record, similarity), or (None, similarity) if no posting is similar enough
+    """
+    letter_id, similarity = get_posting_index(config).search(job_details)
+    if letter_id is None or similarity < config["DUPLICATE_THRESHOLD"]:
+        return None, similarity
+    record = get_letter_archive(config).get(letter_id)
+    if record is None or record['template_hash'] != template_hash(template):
+        return None, similarity
+    return record, similarity
+
+
+def plan_batch_reuse(jobs, config, template=None):
+    """
+    Decide which postings of a batch can reuse a letter instead of a full generation.
+
+    Args:
+        jobs (list): List of complete job_details dictionaries, in submission order
+        config (dict): The shared configuration
+        template (str): The template of the batch, or None
+
+    Returns:
+        tuple: (archived, leaders) where archived maps a job position to the archived
+            letter record to adapt, and leaders maps a job position to the earlier
+            position in the batch whose letter it should adapt
+    """
+    threshold = config["DUPLICATE_THRESHOLD"]
+    archive = get_letter_archive(config)
+    archived = {}
+    for position, (letter_id, similarity) in enumerate(get_posting_index(config).search_many(jobs)):
+        if letter_id is None or similarity < threshold:
+            continue
+        record = archive.get(letter_id)
+        if record is not None and record['template_hash'] == template_hash(template):
+            archived[position] = record
+
+    remaining = [position for position in range(len(jobs)) if position not in archived]
+    groups = group_near_duplicates([jobs[position] for position in remaining], threshold)
+    leaders = {remaining[follower]: remaining[leader] for follower, leader in groups.items()}
+    return archived, leaders
+
+
+_posting_index = None
+_posting_index_lock = threading.Lock()
+
+
+def get_posting_index(config):
+    """Return the process-wide posting index, loading it and catching up with the archive on first use"""
+    global _posting_index
+    with _posting_index_lock:
+        if _posting_index is None:
+            _posting_index = PostingIndex(config["POSTING_INDEX_PATH"], get_letter_archive(config))
+        return _posting_index
@@ -0,0 +1,179 @@
+import math
+import re
+import threading
+from collections import Counter, deque
+
+from config import load_config
+from metrics import metrics
+
+config = load_config()
+
+# Words that mark a line as a hard requirement rather than marketing copy
+REQUIREMENT_CUES = {
+    "required", "requirement", "requirements", "must", "experience", "years", "degree",
+    "proficient", "proficiency", "knowledge", "skills", "familiarity", "ability", "strong",
+}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of",
+    "on", "or", "our", "the", "to", "we", "will", "with", "you", "your", "this", "that",
+}
+
+_WORD_PATTERN = re.compile(r"[a-z0-9+#.]+")
+_BULLET_PATTERN = re.compile(r"^\s*(?:[-*•▪●]|\d+[.)])\s*")
+
+# Before/after token counts of recent prompts, newest last
+prompt_stats = deque(maxlen=1000)
+_prompt_stats_lock = threading.Lock()
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of model tokens in text without calling the API.
+
+    Gemini averages about four characters per token for English prose; counting
+    words as well keeps short, punctuation-heavy lines from being underestimated.
+
+    Args:
+        text (str): The text to measure
+
+    Returns:
+        int: Estimated token count
+    """
+    if not text:
+        return 0
+    return max(math.ceil(len(text) / 4), math.ceil(len(text.split()) * 1.3))
+
+
+def count_prompt_tokens(prompt, use_sdk=False, model_name=None):
+    """
+    Count tokens in a prompt, using the SDK's token counter when asked.
+
+    Args:
+        prompt (str): The prompt to measure
+        use_sdk (bool): Ask the API for an exact count instead of estimating locally
+        model_name (str): The model whose tokenizer to use with use_sdk
+
+    Returns:
+        int: Token count
+    """
+    if use_sdk:
+        from model_pool import get_backend
+        return get_backend().count_tokens(prompt, model_name or config["DEFAULT_MODEL"])
+    return estimate_tokens(prompt)
+
+
+def split_requirements(description):
+    """Split a job description into requirement lines (newlines, bullets, semicolons or commas)"""
+    if "\n" in description:
+        pieces = description.splitlines()
+    elif ";" in description:
+        pieces = description.split(";")
+    else:
+        pieces = description.split(",")
+    lines = [_BULLET_PATTERN.sub("", piece).strip() for piece in pieces]
+    return [line for line in lines if line]
+
+
+def _content_words(line):
+    return [word for word in _WORD_PATTERN.findall(line.lower()) if word not in STOPWORDS]
+
+
+def compact_requirements(description, max_tokens):
+    """
+    Shrink a job description to fit a token budget.
+
+    Requirement lines are deduplicated, ranked by whether they read like hard
+    requirements and how specific their words are to the posting, and the
+    best-ranked lines are kept in their original order until the budget is used.
+    The best-ranked line is always kept, even if it alone exceeds the budget.
+
+    Args:
+        description (str): The job description or comma separated requirements
+        max_tokens (int): Token budget for the description
+
+    Returns:
+        str: The compacted description
+    """
+    if estimate_tokens(description) <= max_tokens:
+        return description
+
+    # Drop duplicates, including reordered ones (same words, different order, case or punctuation)
+    lines = []
+    seen = set()
+    for line in split_requirements(description):
+        key = frozenset(_content_words(line))
+        if key and key not in seen:
+            seen.add(key)
+            lines.append(line)
+
+    # Words shared by many lines are boilerplate; rare words carry the specific skills
+    document_frequency = Counter(word for line in lines for word in set(_content_words(line)))
+
+    def score(line):
+        words = _content_words(line)
+        if not words:
+            return 0.0
+        specificity = sum(math.log(len(lines) / document_frequency[word]) for word in words) / len(words)
+        cues = sum(1 for word in words if word in REQUIREMENT_CUES)
+        has_number = any(char.isdigit() for char in line)
+        return 3 * cues + has_number + specificity
+
+    ranked = sorted(range(len(lines)), key=lambda i: score(lines[i]), reverse=True)
+
+    separator = "\n" if "\n" in description else ", "
+    kept = set()
+    used = 0
+    for i in ranked:
+        cost = estimate_tokens(lines[i] + separator)
+        if used + cost > max_tokens:
+            if not kept:
+                # A prompt without any requirement is worse than one over budget
+                metrics.increment("prompt_budget_exceeded_total")
+                kept.add(i)
+                used += cost
+            continue
+        kept.add(i)
+        used += cost
+
+    return separator.join(lines[i] for i in sorted(kept))
+
+
+def fit_prompt(build_prompt, job_details, max_tokens, count_tokens=estimate_tokens):
+    """
+    Build a prompt and trim the job description until the prompt fits the budget.
+
+    Args:
+        build_prompt (callable): Function taking job_details and returning the prompt text
+        job_details (dict): Dictionary containing job details like company, role, etc.
+        max_tokens (int): Token budget for the whole prompt (0 or None to disable)
+        count_tokens (callable): Function measuring a prompt in tokens (default: local estimate)
+
+    Returns:
+        tuple: (prompt, stats) where stats holds 'tokens_before', 'tokens_after' and
+            'over_budget' (True if even the trimmed prompt exceeds max_tokens)
+    """
+    prompt = build_prompt(job_details)
+    tokens_before = count_tokens(prompt)
+    tokens_after = tokens_before
+
+    description = job_details.get('job_description', '')
+    if max_tokens and tokens_before > max_tokens and description:
+        # Whatever the rest of the prompt costs is fixed; the description gets what is left
+        overhead = count_tokens(build_prompt({**job_details, 'job_description': ''}))
+        description_budget = max(max_tokens - overhead, 0)
+        compacted = compact_requirements(description, description_budget)
+        prompt = build_prompt({**job_details, 'job_description': compacted})
+        tokens_after = count_tokens(prompt)
+
+    stats = {
+        'company_name': job_details.get('company_name', ''),
+        'tokens_before': tokens_before,
+        'tokens_after': tokens_after,
+        'over_budget': bool(max_tokens) and tokens_after > max_tokens,
+    }
+    with _prompt_stats_lock:
+        prompt_stats.append(stats)
+    metrics.observe("prompt_tokens_before_budget", tokens_before)
+    metrics.observe("prompt_tokens_after_budget", tokens_after)
+    return prompt, stats
@@ -0,0 +1,185 @@
+import random
+import threading
+import time
+
+# HTTP status codes worth retrying: quota exhausted and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# google.api_core exception class names for the same conditions, for errors that carry no numeric code
+RETRYABLE_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "InternalServerError", "ServiceUnavailable",
+    "BadGateway", "GatewayTimeout", "DeadlineExceeded",
+}
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at capacity per minute"""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Block until amount tokens are available, then take them"""
+        # A single request larger than the bucket would wait forever, so cap it
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """
+    Limit the number of in-flight requests with an AIMD controller.
+
+    Each successful request raises the limit by increase/limit (about +1 per
+    round of requests); a throttled request multiplies it by decrease.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, increase=1.0, decrease=0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def seed(self, limit):
+        """Start from limit in-flight requests (capped at maximum), e.g. the concurrency a batch asked for"""
+        with self._condition:
+            self.limit = float(max(self.minimum, min(self.maximum, limit)))
+            self._condition.notify_all()
+
+    def release(self, throttled=False):
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+            else:
+                self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+            self._condition.notify_all()
+
+
+def is_retryable(error):
+    """Return True for quota (429) and transient server (5xx) errors"""
+    code = getattr(error, "code", None)
+    # google.api_core exceptions expose the HTTP status as .code; grpc errors expose a method
+    if callable(code):
+        code = None
+    if isinstance(code, int) and code in RETRYABLE_STATUS_CODES:
+        return True
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def is_throttled(error):
+    """Return True if the error means we are sending too fast"""
+    return getattr(error, "code", None) == 429 or type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits plus adaptive concurrency for model calls"""
+
+    def __init__(self, requests_per_minute=60, tokens_per_minute=1000000, max_retries=5,
+                 base_delay=1.0, max_delay=60.0, initial_concurrency=4, max_concurrency=32):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.concurrency = AdaptiveConcurrency(initial=initial_concurrency, maximum=max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        self.throttled = 0
+        self._stats_lock = threading.Lock()
+
+    def backoff_delay(self, attempt):
+        """Full-jitter exponential backoff: a random delay up to base_delay * 2**attempt"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, function, estimated_tokens=0, max_retries=None):
+        """
+        Run function() within the rate limits, retrying quota and server errors.
+
+        Args:
+            function (callable): The model call to make
+            estimated_tokens (int): Tokens to reserve against the tokens-per-minute limit
+            max_retries (int): Retries for this call (default: the limiter's max_retries)
+
+        Returns:
+            The return value of function()
+        """
+        max_retries = self.max_retries if max_retries is None else max_retries
+        attempt = 0
+        while True:
+            if self.requests is not None:
+                self.requests.acquire()
+            if self.tokens is not None and estimated_tokens:
+                self.tokens.acquire(estimated_tokens)
+
+            self.concurrency.acquire()
+            try:
+                result = function()
+            except Exception as e:
+                throttled = is_throttled(e)
+                self.concurrency.release(throttled=throttled)
+                if throttled:
+                    with self._stats_lock:
+                        self.throttled += 1
+                if not is_retryable(e) or attempt >= max_retries:
+                    raise
+                with self._stats_lock:
+                    self.retries += 1
+                time.sleep(self.backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            self.concurrency.release()
+            return result
+
+    def stats(self):
+        """Return retry and throttling counters and the current concurrency limit"""
+        return {
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "concurrency_limit": int(self.concurrency.limit),
+            "in_flight": self.concurrency.in_flight,
+        }
+
+
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter(config):
+    """Return the process-wide rate limiter shared by every model call"""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter(
+                requests_per_minute=config["REQUESTS_PER_MINUTE"],
+                tokens_per_minute=config["TOKENS_PER_MINUTE"],
+                max_retries=config["MAX_RETRIES"],
+                # Start at the configured concurrency and let AIMD back off from there on throttling
+                initial_concurrency=config["MAX_CONCURRENCY"],
+                max_concurrency=config["MAX_CONCURRENCY"],
+            )
+        return _rate_limiter
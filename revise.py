@@ -0,0 +1,160 @@
+import json
+import re
+
+from generate_CL import generate_cover_letter, generate_text
+from prompt_budget import STOPWORDS, split_requirements
+from usage import template_label, usage_labels
+
+# Fields whose exact value appears in the letter and can simply be swapped
+LITERAL_FIELDS = ['company_name', 'job_title', 'your_name', 'email', 'phone', 'city', 'country']
+
+# Fields that change what the letter argues, so the paragraphs about them are rewritten
+SEMANTIC_FIELDS = ['job_description', 'industry']
+
+# Paragraphs shorter than this are treated as greeting, sign-off or contact lines
+MIN_BODY_WORDS = 15
+
+_WORD_PATTERN = re.compile(r"[a-z0-9+#]+")
+
+
+def split_paragraphs(cover_letter_text):
+    """Split a letter on blank lines, the same way export_to_pdf() does"""
+    return [p.strip() for p in cover_letter_text.split('\n\n') if p.strip()]
+
+
+def _words(text):
+    # Stopwords appear in every paragraph, so they would mark the whole letter as affected
+    return {word for word in _WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS}
+
+
+class RevisableLetter:
+    """
+    A generated letter kept as paragraphs together with the inputs that produced it.
+
+    revise() applies changed inputs by editing only the paragraphs they affect,
+    so the cost of a correction scales with the edit, not with the letter.
+    """
+
+    def __init__(self, cover_letter_text, job_details, template=None):
+        self.paragraphs = split_paragraphs(cover_letter_text)
+        self.job_details = dict(job_details)
+        self.template = template
+
+    @classmethod
+    def generate(cls, template, job_details, **kwargs):
+        """Generate a new letter with generate_cover_letter() and keep it revisable"""
+        return cls(generate_cover_letter(template, job_details, **kwargs), job_details, template)
+
+    @property
+    def text(self):
+        return "\n\n".join(self.paragraphs)
+
+    def _replace_literals(self, new_job_details):
+        """Swap changed literal values in place and return the indices of the edited paragraphs"""
+        edited = set()
+        for field in LITERAL_FIELDS:
+            old_value = self.job_details.get(field, '')
+            new_value = new_job_details.get(field, '')
+            if not old_value or old_value == new_value:
+                continue
+            # Whole-word matches only, so a title like "Dev" doesn't rewrite "Development"
+            pattern = re.compile(rf"(?<!\w){re.escape(old_value)}(?!\w)")
+            for index, paragraph in enumerate(self.paragraphs):
+                revised = pattern.sub(lambda _: new_value, paragraph)
+                if revised != paragraph:
+                    self.paragraphs[index] = revised
+                    edited.add(index)
+        return edited
+
+    def affected_paragraphs(self, new_job_details):
+        """
+        Find the body paragraphs that argue from a changed job description or industry.
+
+        Args:
+            new_job_details (dict): The corrected job details
+
+        Returns:
+            list: Indices of paragraphs to regenerate
+        """
+        changed = [field for field in SEMANTIC_FIELDS
+                   if self.job_details.get(field, '') != new_job_details.get(field, '')]
+        if not changed:
+            return []
+
+        # Words of the old values: paragraphs using them were written from the old inputs
+        old_terms = set()
+        for field in changed:
+            old_value = self.job_details.get(field, '')
+            pieces = split_requirements(old_value) if field == 'job_description' else [old_value]
+            for piece in pieces:
+                old_terms |= _words(piece)
+        # Words shared with the new inputs don't need a rewrite
+        for field in changed:
+            old_terms -= _words(new_job_details.get(field, ''))
+
+        body = [index for index, paragraph in enumerate(self.paragraphs)
+                if len(paragraph.split()) >= MIN_BODY_WORDS]
+        affected = [index for index in body if _words(self.paragraphs[index]) & old_terms]
+
+        if not affected and body:
+            # Nothing mentions the old wording; rewrite the paragraph closest to the new requirements
+            new_terms = set()
+            for field in changed:
+                new_terms |= _words(new_job_details.get(field, ''))
+            affected = [max(body, key=lambda index: len(_words(self.paragraphs[index]) & new_terms))]
+        return affected
+
+    def _build_revision_prompt(self, indices, new_job_details):
+        numbered = "\n\n".join(f"{number}. {self.paragraphs[index]}" for number, index in enumerate(indices, 1))
+        return f"""Rewrite the numbered paragraphs of a cover letter so they fit the updated job details. Keep each paragraph's role, tone and approximate length.
+Company: {new_job_details.get('company_name', '')}
+Job title: {new_job_details.get('job_title', '')}
+Industry: {new_job_details.get('industry', '')}
+Job requirements: {new_job_details.get('job_description', '')}
+
+Paragraphs:
+{numbered}
+
+Return only a JSON object mapping each paragraph number (as a string) to its rewritten text."""
+
+    def revise(self, new_job_details, use_cache=True):
+        """
+        Update the letter for changed inputs, regenerating only the affected paragraphs.
+
+        Changed names, titles and contact details are swapped in locally. Changes
+        to the job description or industry rewrite the paragraphs that relied on
+        the old values, in one model call.
+
+        Args:
+            new_job_details (dict): The corrected job details
+            use_cache (bool): Look up and store the model response in the on-disk response cache
+
+        Returns:
+            str: The revised cover letter
+        """
+        new_job_details = {**self.job_details, **new_job_details}
+        # Find semantic targets before literal swaps change the paragraph text
+        indices = self.affected_paragraphs(new_job_details)
+        self._replace_literals(new_job_details)
+
+        if indices:
+            prompt = self._build_revision_prompt(indices, new_job_details)
+            with usage_labels(template=template_label(self.template), operation="revision"):
+                response_text = generate_text(prompt, use_cache=use_cache,
+                                              generation_config={"response_mime_type": "application/json"})
+            try:
+                rewritten = json.loads(response_text)
+                replacements = {index: rewritten[str(number)].strip() for number, index in enumerate(indices, 1)}
+            except (ValueError, KeyError, AttributeError, TypeError) as e:
+                # A malformed answer would leave the letter half-edited; regenerate it whole instead
+                print(f"Could not apply paragraph revisions ({e}), regenerating the whole letter.")
+                self.paragraphs = split_paragraphs(
+                    generate_cover_letter(self.template, new_job_details, use_cache=use_cache))
+                self.job_details = new_job_details
+                return self.text
+
+            for index, paragraph in replacements.items():
+                self.paragraphs[index] = paragraph
+
+        self.job_details = new_job_details
+        return self.text
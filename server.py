@@ -0,0 +1,305 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import threading
+
+from generate_CL import generate_cover_letter, stream_cover_letter
+from user_input import suggest_industries
+
+# Refuse request bodies larger than this many bytes
+MAX_BODY_BYTES = 1024 * 1024
+
+# Seconds an idle keep-alive connection stays open
+KEEP_ALIVE_TIMEOUT = 30
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ConnectionAborted(Exception):
+    """Raised when a response fails halfway and the connection has to be dropped"""
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def request_key(kind, payload):
+    """Hash an endpoint name and JSON payload so identical requests share a key"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{kind}\0{canonical}".encode('utf-8')).hexdigest()
+
+
+class Coalescer:
+    """Run identical concurrent calls once and hand the result to every caller"""
+
+    def __init__(self):
+        self._in_flight = {}
+        self.coalesced = 0
+
+    async def run(self, key, function, *args):
+        """
+        Call function(*args) on a worker thread, unless an identical call is already running.
+
+        Args:
+            key (str): Identity of the call, e.g. from request_key()
+            function (callable): Blocking function to run
+            *args: Arguments for function
+
+        Returns:
+            The function's return value
+        """
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shield() so one caller disconnecting doesn't cancel the others' result
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(asyncio.to_thread(function, *args))
+        self._in_flight[key] = future
+        future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(future)
+
+
+class SharedStream:
+    """A streamed letter that several identical requests read at the same time"""
+
+    def __init__(self, loop, chunk_iterator):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Condition()
+        self._loop = loop
+        # Pull chunks on a thread so the event loop never blocks on the model
+        threading.Thread(target=self._produce, args=(chunk_iterator,), daemon=True).start()
+
+    def _produce(self, chunk_iterator):
+        try:
+            for chunk in chunk_iterator:
+                asyncio.run_coroutine_threadsafe(self._publish(chunk), self._loop).result()
+        except Exception as e:
+            self.error = e
+        asyncio.run_coroutine_threadsafe(self._publish(None), self._loop).result()
+
+    async def _publish(self, chunk):
+        async with self._changed:
+            if chunk is None:
+                self.done = True
+            else:
+                self.chunks.append(chunk)
+            self._changed.notify_all()
+
+    async def read(self):
+        """Yield every chunk from the start, waiting for new ones until the stream ends"""
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: self.done or position < len(self.chunks))
+                pending = self.chunks[position:]
+                finished = self.done
+            for chunk in pending:
+                yield chunk
+            position += len(pending)
+            if finished and position >= len(self.chunks):
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class GenerationService:
+    """HTTP/1.1 service for industry suggestions, letter generation and PDF rendering"""
+
+    def __init__(self):
+        self.coalescer = Coalescer()
+        self._streams = {}
+
+    async def handle_connection(self, reader, writer):
+        """Serve requests on one connection until the client closes it or goes idle"""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(self._read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HttpError as e:
+                    # The body was not read, so the connection can't carry another request
+                    try:
+                        await self._send(writer, e.status, {"error": str(e)}, False)
+                    except ConnectionError:
+                        pass
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                try:
+                    await self._dispatch(method, path, body, writer, keep_alive)
+                except ConnectionAborted:
+                    break
+                except HttpError as e:
+                    await self._send(writer, e.status, {"error": str(e)}, keep_alive)
+                except Exception as e:
+                    await self._send(writer, 500, {"error": f"{type(e).__name__}: {e}"}, keep_alive)
+
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        try:
+            method, path, _ = request_line.decode('latin-1').split(" ", 2)
+        except ValueError:
+            return None
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length header")
+        if length < 0:
+            raise HttpError(400, "Invalid Content-Length header")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, f"Request body larger than {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method, path.split("?", 1)[0], headers, body
+
+    async def _dispatch(self, method, path, body, writer, keep_alive):
+        if path == "/health":
+            await self._send(writer, 200, {"status": "ok", "coalesced": self.coalescer.coalesced}, keep_alive)
+            return
+
+        routes = {
+            "/industries": self.suggest,
+            "/letters": self.generate,
+            "/pdf": self.render_pdf,
+        }
+        handler = routes.get(path)
+        if handler is None:
+            raise HttpError(404, f"No such endpoint: {path}")
+        if method != "POST":
+            raise HttpError(405, "Use POST")
+
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HttpError(400, "Request body must be JSON")
+        if not isinstance(payload, dict):
+            raise HttpError(400, "Request body must be a JSON object")
+
+        await handler(payload, writer, keep_alive)
+
+    async def suggest(self, payload, writer, keep_alive):
+        company_name = payload.get("company_name")
+        if not company_name:
+            raise HttpError(400, "company_name is required")
+        industries = await self.coalescer.run(request_key("industries", payload), suggest_industries, company_name)
+        await self._send(writer, 200, {"industries": industries}, keep_alive)
+
+    async def generate(self, payload, writer, keep_alive):
+        job_details = payload.get("job_details")
+        if not isinstance(job_details, dict):
+            raise HttpError(400, "job_details must be an object")
+        template = payload.get("template")
+        key = request_key("letters", {"template": template, "job_details": job_details})
+
+        if not payload.get("stream"):
+            cover_letter = await self.coalescer.run(key, generate_cover_letter, template, job_details)
+            await self._send(writer, 200, {"cover_letter": cover_letter}, keep_alive)
+            return
+
+        # Identical streaming requests read from one shared upstream stream
+        stream = self._streams.get(key)
+        if stream is None:
+            stream = SharedStream(asyncio.get_running_loop(), stream_cover_letter(template, job_details))
+            self._streams[key] = stream
+        else:
+            self.coalescer.coalesced += 1
+
+        try:
+            await self._send_chunked(writer, stream.read(), keep_alive)
+        finally:
+            if stream.done and self._streams.get(key) is stream:
+                del self._streams[key]
+
+    async def render_pdf(self, payload, writer, keep_alive):
+        from pdf_export import render_pdf_bytes
+
+        cover_letter = payload.get("cover_letter")
+        job_details = payload.get("job_details")
+        if not cover_letter or not isinstance(job_details, dict):
+            raise HttpError(400, "cover_letter and job_details are required")
+        missing = [field for field in ('your_name', 'city', 'country', 'phone', 'email') if field not in job_details]
+        if missing:
+            raise HttpError(400, f"job_details is missing: {', '.join(missing)}")
+
+        key = request_key("pdf", payload)
+        pdf_bytes = await self.coalescer.run(key, render_pdf_bytes, cover_letter, job_details, payload.get("title"))
+        await self._send_bytes(writer, 200, pdf_bytes, "application/pdf", keep_alive)
+
+    async def _send(self, writer, status, data, keep_alive):
+        await self._send_bytes(writer, status, json.dumps(data).encode('utf-8'), "application/json", keep_alive)
+
+    async def _send_bytes(self, writer, status, body, content_type, keep_alive):
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+    async def _send_chunked(self, writer, chunks, keep_alive):
+        head = ("HTTP/1.1 200 OK\r\n"
+                "Content-Type: text/plain; charset=utf-8\r\n"
+                "Transfer-Encoding: chunked\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1'))
+        try:
+            async for chunk in chunks:
+                data = chunk.encode('utf-8')
+                writer.write(f"{len(data):x}\r\n".encode('latin-1') + data + b"\r\n")
+                await writer.drain()
+        except Exception as e:
+            # The status line is already sent, so the only way to signal failure is to cut the response short
+            print(f"Streaming response failed: {e}")
+            raise ConnectionAborted() from e
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+async def serve(host="127.0.0.1", port=8080):
+    service = GenerationService()
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"Cover letter service listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve cover letter generation over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="Interface to listen on")
+    parser.add_argument("--port", type=int, default=8080, help="Port to listen on")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import json
+import re
+from datetime import date
+from functools import lru_cache
+
+# Placeholders are written in square brackets, e.g. "[Company Name]" or "[Why I want this role]"
+PLACEHOLDER_PATTERN = re.compile(r"\[([^\[\]\n]{1,200})\]")
+
+# Placeholder labels that map to values we already know exactly
+FIELD_ALIASES = {
+    'company_name': ['company name', 'company', 'name of company', 'company_name', 'employer'],
+    'job_title': ['job title', 'position', 'position title', 'role', 'job_title', 'job position'],
+    'your_name': ['your name', 'name', 'full name', 'applicant name', 'your_name', 'your full name'],
+    'email': ['email', 'email address', 'your email', 'your email address', 'e-mail'],
+    'phone': ['phone', 'phone number', 'your phone', 'your phone number', 'telephone'],
+    'city': ['city', 'your city'],
+    'country': ['country', 'your country'],
+    'location': ['location', 'your location', 'city, country', 'address', 'your address'],
+    'industry': ['industry', 'company industry'],
+    'date': ['date', "today's date", 'current date'],
+}
+_ALIAS_TO_FIELD = {alias: field for field, aliases in FIELD_ALIASES.items() for alias in aliases}
+
+
+def _normalize_label(label):
+    """Lowercase a placeholder label and collapse whitespace and surrounding punctuation"""
+    return " ".join(label.lower().split()).strip(" .:;-_")
+
+
+def _field_value(field, job_details):
+    """Return the locally known value for a deterministic field"""
+    if field == 'location':
+        return f"{job_details.get('city', '')}, {job_details.get('country', '')}"
+    if field == 'date':
+        return date.today().strftime("%B %d, %Y")
+    return job_details.get(field, '')
+
+
+class CompiledTemplate:
+    """A template split into literal text, known fields and free-text slots"""
+
+    def __init__(self, template):
+        # Each segment is ('text', literal), ('field', field name) or ('slot', slot number)
+        self.segments = []
+        # Slot labels in order of first appearance; repeated labels share one slot
+        self.slots = []
+        slot_numbers = {}
+
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(template):
+            if match.start() > position:
+                self.segments.append(('text', template[position:match.start()]))
+
+            label = match.group(1).strip()
+            field = _ALIAS_TO_FIELD.get(_normalize_label(label))
+            if field:
+                self.segments.append(('field', field))
+            else:
+                key = _normalize_label(label)
+                if key not in slot_numbers:
+                    slot_numbers[key] = len(self.slots) + 1
+                    self.slots.append(label)
+                self.segments.append(('slot', slot_numbers[key]))
+            position = match.end()
+
+        if position < len(template):
+            self.segments.append(('text', template[position:]))
+
+    @property
+    def has_placeholders(self):
+        """True if the template contains any bracketed placeholder"""
+        return any(kind != 'text' for kind, _ in self.segments)
+
+    def build_slot_prompt(self, job_details):
+        """
+        Build a compact prompt asking the model only for the free-text slots.
+
+        Args:
+            job_details (dict): Dictionary containing job details like company, role, etc.
+
+        Returns:
+            str: The prompt, or None if the template has no free-text slots
+        """
+        if not self.slots:
+            return None
+
+        slot_lines = "\n".join(f"{number}. {label}" for number, label in enumerate(self.slots, 1))
+        return f"""Write the missing parts of a professional cover letter.
+Company: {job_details.get('company_name', '')}
+Job title: {job_details.get('job_title', '')}
+Industry: {job_details.get('industry', '')}
+Job requirements: {job_details.get('job_description', '')}
+Applicant: {job_details.get('your_name', '')}
+
+Missing parts:
+{slot_lines}
+
+Return only a JSON object mapping each part number (as a string) to its text. Each text must read naturally in a letter, sound professional and enthusiastic, and highlight how the applicant matches the requirements."""
+
+    def parse_slot_response(self, response_text):
+        """
+        Parse the model's JSON answer into slot texts.
+
+        Args:
+            response_text (str): The model response, a JSON object keyed by slot number
+
+        Returns:
+            dict: Slot number to text
+
+        Raises:
+            ValueError: If the response is not valid JSON or misses a slot
+        """
+        text = response_text.strip()
+        # Tolerate a Markdown code fence around the JSON
+        if text.startswith("```"):
+            text = text.strip("`")
+            text = text[text.index("\n") + 1:] if "\n" in text else text
+        data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError(f"Model response is a JSON {type(data).__name__}, not an object keyed by slot number")
+
+        values = {}
+        for number in range(1, len(self.slots) + 1):
+            value = data.get(str(number))
+            if not isinstance(value, str):
+                raise ValueError(f"Model response is missing template slot {number} ({self.slots[number - 1]})")
+            values[number] = value.strip()
+        return values
+
+    def render(self, job_details, slot_values=None):
+        """
+        Fill in the template.
+
+        Args:
+            job_details (dict): Values for the known fields
+            slot_values (dict): Slot number to text for the free-text slots
+
+        Returns:
+            str: The filled-in cover letter
+        """
+        slot_values = slot_values or {}
+        parts = []
+        for kind, value in self.segments:
+            if kind == 'text':
+                parts.append(value)
+            elif kind == 'field':
+                parts.append(_field_value(value, job_details))
+            else:
+                parts.append(slot_values.get(value, ''))
+        return "".join(parts)
+
+
+@lru_cache(maxsize=32)
+def compile_template(template):
+    """
+    Parse a template once and reuse the compiled form for later letters.
+
+    Args:
+        template (str): The cover letter template text
+
+    Returns:
+        CompiledTemplate: The parsed template
+    """
+    return CompiledTemplate(template)
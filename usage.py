@@ -0,0 +1,272 @@
+import argparse
+import contextlib
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+# USD per million tokens (prompt, output); MODEL_PRICES in the environment overrides or extends these
+DEFAULT_PRICES = {
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+}
+
+# Backends whose calls cost nothing, like the offline fake backend; their calls are logged at $0
+UNPRICED_BACKENDS = {"fake"}
+
+# What the calls made inside a usage_labels() block are attributed to
+_labels = contextvars.ContextVar("usage_labels", default={})
+
+
+class BudgetExceeded(Exception):
+    """Raised before a model call that would take the run over its token or cost budget"""
+
+
+def template_label(template):
+    """Short, stable label for a template; "none" for letters written without one"""
+    if not template:
+        return "none"
+    return hashlib.sha256(template.encode('utf-8')).hexdigest()[:12]
+
+
+@contextlib.contextmanager
+def usage_labels(**values):
+    """
+    Attribute the model calls made inside the block, e.g. usage_labels(template=..., operation="letter").
+
+    Labels nest; inner values override outer ones.
+    """
+    token = _labels.set({**_labels.get(), **values})
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+
+def current_labels():
+    return dict(_labels.get())
+
+
+def usage_counts(response):
+    """
+    Read token counts from a response's usage_metadata.
+
+    Returns:
+        tuple: (prompt_tokens, output_tokens, total_tokens), or None if the response has no usage metadata
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or 0
+    output_tokens = getattr(usage, "candidates_token_count", 0) or 0
+    total_tokens = getattr(usage, "total_token_count", 0) or prompt_tokens + output_tokens
+    return prompt_tokens, output_tokens, total_tokens
+
+
+class UsageLedger:
+    """
+    Append-only log of token usage and latency per model call, with run budgets.
+
+    Each call is one compact JSON line. Totals for the current run are also
+    kept in memory, so budget checks never read the log.
+
+    Args:
+        path (str): JSON lines file the calls are appended to
+        token_budget (int): Maximum total tokens for this run (0 for no limit)
+        cost_budget (float): Maximum cost in USD for this run (0 for no limit)
+        prices (dict): Model name to (prompt, output) USD per million tokens
+        run_id (str): Identifier of this run (default: a new random id)
+    """
+
+    def __init__(self, path, token_budget=0, cost_budget=0.0, prices=None, run_id=None):
+        self.path = path
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        self.prices = {**DEFAULT_PRICES, **(prices or {})}
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:6]
+        self.totals = {}
+        self._spent_tokens = 0
+        self._spent_cost = 0.0
+        self._reserved_tokens = 0
+        self._reserved_cost = 0.0
+        self._changed = threading.Condition()
+        self._write_lock = threading.Lock()
+
+    def cost(self, model_name, prompt_tokens, output_tokens, backend=None):
+        """Price a call in USD; unknown models and unpriced backends cost 0"""
+        if backend in UNPRICED_BACKENDS:
+            return 0.0
+        prompt_price, output_price = self.prices.get(model_name, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + output_tokens * output_price) / 1e6
+
+    def _over_budget(self, tokens, cost, include_reserved):
+        spent_tokens = self._spent_tokens + (self._reserved_tokens if include_reserved else 0)
+        spent_cost = self._spent_cost + (self._reserved_cost if include_reserved else 0.0)
+        return ((self.token_budget and spent_tokens + tokens > self.token_budget)
+                or (self.cost_budget and spent_cost + cost > self.cost_budget))
+
+    def reserve(self, model_name, prompt_tokens, output_tokens, wait=True, backend=None):
+        """
+        Reserve the expected usage of a call against the run budget before sending it.
+
+        A call that only fits once calls already in flight have reported their
+        real usage waits for them, which slows a batch down as it nears its
+        budget. A call that would not fit even then raises BudgetExceeded.
+
+        Args:
+            wait (bool): Wait for calls in flight when they are what blocks the reservation;
+                if False, raise BudgetExceeded straight away
+            backend (str): Name of the backend the call goes to, for pricing
+
+        Returns:
+            tuple: The reservation, to pass to release()
+        """
+        tokens = prompt_tokens + output_tokens
+        cost = self.cost(model_name, prompt_tokens, output_tokens, backend)
+        with self._changed:
+            while self._over_budget(tokens, cost, include_reserved=True):
+                if not wait or self._over_budget(tokens, cost, include_reserved=False) or not self._reserved_tokens:
+                    raise BudgetExceeded(
+                        f"Run {self.run_id} would exceed its budget: {self._spent_tokens} tokens "
+                        f"and ${self._spent_cost:.4f} spent, next call needs about {tokens} tokens")
+                self._changed.wait()
+            self._reserved_tokens += tokens
+            self._reserved_cost += cost
+        return tokens, cost
+
+    def release(self, reservation):
+        """Return a reservation once the call's real usage is recorded (or the call failed)"""
+        tokens, cost = reservation
+        with self._changed:
+            self._reserved_tokens -= tokens
+            self._reserved_cost -= cost
+            self._changed.notify_all()
+
+    def record(self, model_name, prompt_tokens, output_tokens, total_tokens, latency, call_labels=None,
+               backend=None):
+        """
+        Log one model call and add it to the run totals.
+
+        Args:
+            model_name (str): The model that answered
+            prompt_tokens (int): Tokens in the prompt
+            output_tokens (int): Tokens in the answer
+            total_tokens (int): Total tokens billed
+            latency (float): Seconds the call took
+            call_labels (dict): Attribution such as template and operation (default: the current usage_labels())
+            backend (str): Name of the backend that answered (default: "gemini")
+        """
+        call_labels = current_labels() if call_labels is None else call_labels
+        backend = backend or "gemini"
+        cost = self.cost(model_name, prompt_tokens, output_tokens, backend)
+        entry = {
+            "ts": round(time.time(), 3),
+            "run": self.run_id,
+            "backend": backend,
+            "model": model_name,
+            "template": call_labels.get("template", "none"),
+            "op": call_labels.get("operation", "other"),
+            "in": prompt_tokens,
+            "out": output_tokens,
+            "total": total_tokens,
+            "ms": round(latency * 1000, 1),
+            "usd": round(cost, 6),
+        }
+
+        with self._changed:
+            self._spent_tokens += total_tokens
+            self._spent_cost += cost
+            _add_to_totals(self.totals, entry, ("backend", "model", "template", "op"))
+            self._changed.notify_all()
+
+        with self._write_lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a') as file:
+                file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def summary(self):
+        """Return this run's spend and its totals per model, template and operation"""
+        with self._changed:
+            return {
+                "run": self.run_id,
+                "tokens": self._spent_tokens,
+                "cost": self._spent_cost,
+                "totals": {key: dict(value) for key, value in self.totals.items()},
+            }
+
+
+def _add_to_totals(totals, entry, group_by):
+    # Entries logged before the backend was recorded have no "backend" field
+    key = " ".join(f"{field}={entry.get(field, 'unknown')}" for field in group_by)
+    bucket = totals.setdefault(key, {"calls": 0, "in": 0, "out": 0, "total": 0, "usd": 0.0, "ms": 0.0})
+    bucket["calls"] += 1
+    for field in ("in", "out", "total", "usd", "ms"):
+        bucket[field] += entry[field]
+
+
+def summarize_ledger(path, group_by=("run", "backend", "model", "template")):
+    """
+    Aggregate a ledger file.
+
+    Args:
+        path (str): The ledger's JSON lines file
+        group_by (tuple): Entry fields to group by, any of run, backend, model, template and op
+
+    Returns:
+        dict: "field=value ..." group key to calls, in/out/total tokens, usd and total ms
+    """
+    totals = {}
+    if not os.path.exists(path):
+        return totals
+    with open(path, 'r') as file:
+        for line in file:
+            if line.strip():
+                _add_to_totals(totals, json.loads(line), group_by)
+    return totals
+
+
+_usage_ledger = None
+_usage_ledger_lock = threading.Lock()
+
+
+def get_usage_ledger(config):
+    """Return the process-wide usage ledger, creating it on first use"""
+    global _usage_ledger
+    with _usage_ledger_lock:
+        if _usage_ledger is None:
+            _usage_ledger = UsageLedger(
+                config["USAGE_LEDGER_PATH"],
+                token_budget=config["RUN_TOKEN_BUDGET"],
+                cost_budget=config["RUN_COST_BUDGET"],
+                prices=config["MODEL_PRICES"],
+            )
+        return _usage_ledger
+
+
+def main(argv=None):
+    from config import load_config
+
+    parser = argparse.ArgumentParser(description="Summarize the token and cost ledger.")
+    parser.add_argument("--by", default="run,backend,model,template",
+                        help="Comma separated fields to group by: run, backend, model, template, op")
+    parser.add_argument("--path", default=None, help="Ledger file (default: USAGE_LEDGER_PATH)")
+    args = parser.parse_args(argv)
+
+    path = args.path or load_config()["USAGE_LEDGER_PATH"]
+    totals = summarize_ledger(path, tuple(field.strip() for field in args.by.split(",") if field.strip()))
+    if not totals:
+        print(f"No usage recorded in {path}")
+        return 0
+    for key, bucket in sorted(totals.items()):
+        print(f"{key}: {bucket['calls']} calls, {bucket['in']} in + {bucket['out']} out = {bucket['total']} tokens, "
+              f"${bucket['usd']:.4f}, mean {bucket['ms'] / bucket['calls']:.0f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
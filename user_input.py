@@ -1,12 +1,73 @@
-import google.generativeai as genai
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
 from config import load_config
+from metrics import metrics
+from model_pool import generate_content
+from industry_index import get_industry_index
+from usage import usage_labels
 
-# Load API key
+# Load the shared configuration (read once per process)
 config = load_config()
 
+DEFAULT_INDUSTRIES = ["Technology", "Finance", "Healthcare", "Retail", "Manufacturing"]
+
+# JSON schema the model's answer is constrained to
+INDUSTRIES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "industries": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["industries"],
+}
+
+# Longest industry name we accept; anything longer is a sentence, not an industry
+MAX_INDUSTRY_LENGTH = 60
+
+_LIST_ITEM_PATTERN = re.compile(r"^\s*(?:\d+\s*[.):-]|[-*•])\s*(.+?)\s*$")
+
+def parse_industries(response_text):
+    """
+    Parse and validate the model's industry suggestions.
+
+    Expects {"industries": [...]} (or a bare JSON list). If the answer is not
+    JSON, numbered or bulleted lines such as "1. Tech", "1) Tech" or "- Tech"
+    are accepted instead. Malformed entries are dropped, never raised.
+
+    Args:
+        response_text (str): The model response
+
+    Returns:
+        list: Distinct industry names, possibly empty
+    """
+    try:
+        data = json.loads(response_text)
+        candidates = data.get("industries", []) if isinstance(data, dict) else data
+        if not isinstance(candidates, list):
+            candidates = []
+    except ValueError:
+        candidates = []
+        for line in response_text.splitlines():
+            match = _LIST_ITEM_PATTERN.match(line)
+            if match:
+                candidates.append(match.group(1))
+
+    industries = []
+    for candidate in candidates:
+        if not isinstance(candidate, str):
+            continue
+        industry = candidate.strip().strip('*').strip()
+        if industry and len(industry) <= MAX_INDUSTRY_LENGTH and industry not in industries:
+            industries.append(industry)
+    return industries
+
 def suggest_industries(company_name):
     """
     Use Gemini to suggest three possible industries for the company.
+
+    Companies that were suggested before (or that are listed in the seed file)
+    are answered from the local industry index without calling the model.
     
     Args:
         company_name (str): The name of the company
@@ -14,44 +75,52 @@ def suggest_industries(company_name):
     Returns:
         list: List of three suggested industries
     """
+    with metrics.timer("suggest_industries"), usage_labels(operation="industries"):
+        return _suggest_industries(company_name)
+
+
+def _suggest_industries(company_name):
+    index = get_industry_index(config)
+    known_industries = index.lookup(company_name)
+    if known_industries:
+        metrics.increment("cache_hits_total", cache="industries")
+        # Seed files may list fewer than three industries for a company
+        return _pad_industries(known_industries)
+    metrics.increment("cache_misses_total", cache="industries")
+
     try:
-        # Initialize the Gemini model
-        model = genai.GenerativeModel(config["DEFAULT_MODEL"])
-        
         # Create the prompt for industry suggestions
-        prompt = f"""
-        Based on the company name "{company_name}", suggest three possible industries this company might be in.
-        Return only the three industries in a numbered list, with no additional text or explanation.
-        For example:
-        1. Technology
-        2. Healthcare
-        3. Finance
-        """
-        
-        # Generate industry suggestions
-        response = model.generate_content(prompt)
+        prompt = f"""Suggest the three industries the company "{company_name}" is most likely in, most likely first."""
         
-        # Parse the response to get the three industries
-        industries = []
-        for line in response.text.strip().split('\n'):
-            if line.strip() and line[0].isdigit():
-                # Remove the number and period, then strip whitespace
-                industry = line.split('.', 1)[1].strip()
-                industries.append(industry)
-        
-        # If we didn't get exactly 3 industries, add generic ones
-        while len(industries) < 3:
-            default_industries = ["Technology", "Finance", "Healthcare", "Retail", "Manufacturing"]
-            for ind in default_industries:
-                if ind not in industries:
-                    industries.append(ind)
-                    break
+        # Generate industry suggestions as schema-constrained JSON on the fast model tier
+        generation_config = {
+            **config["SUGGEST_GENERATION_CONFIG"],
+            "response_mime_type": "application/json",
+            "response_schema": INDUSTRIES_SCHEMA,
+        }
+        response = generate_content(prompt, config["SUGGEST_MODEL"], generation_config)
+        industries = parse_industries(response.text)
+
+        # Only remember real model answers, not the generic padding below
+        if industries:
+            index.add(company_name, industries[:3])
         
-        return industries[:3]  # Return only the first 3 industries
+        return _pad_industries(industries)
     
     except Exception as e:
         print(f"Error suggesting industries: {e}")
-        return ["Technology", "Finance", "Healthcare"]  # Default fallback
+        return DEFAULT_INDUSTRIES[:3]  # Default fallback
+
+
+def _pad_industries(industries):
+    """Return exactly three industries, adding generic ones if fewer were found"""
+    industries = list(industries)
+    for ind in DEFAULT_INDUSTRIES:
+        if len(industries) >= 3:
+            break
+        if ind not in industries:
+            industries.append(ind)
+    return industries[:3]
 
 
 def get_user_input():
@@ -59,39 +128,47 @@ def get_user_input():
     print("Please provide details about the job you're applying for:")
     company_name = input("Company name: ")
     
-    # Suggest industries based on company name
-    print(f"\nSuggesting industries for {company_name}...")
-    suggested_industries = suggest_industries(company_name)
+    # Suggest industries in the background while the user answers the remaining questions
+    executor = ThreadPoolExecutor(max_workers=1)
+    suggestion = executor.submit(suggest_industries, company_name)
+    executor.shutdown(wait=False)
+    
+    job_details = {
+        'company_name': company_name,
+        'job_title': input("Job title: "),
+        'job_description': input("Key requirements from job description (comma separated): "),
+        'your_name': input("Your name: "),
+        'email': input("Your email address: "),
+        'phone': input("Your phone number: "),
+        'city': input("Your city: "),
+        'country': input("Your country: ")
+    }
+    
+    if not suggestion.done():
+        print(f"\nSuggesting industries for {company_name}...")
+    suggested_industries = suggestion.result()
     
     print("\nSelect the most appropriate industry:")
     for i, industry in enumerate(suggested_industries, 1):
         print(f"{i}. {industry}")
-    print("4. Other (specify)")
+    # Only the industries actually printed can be chosen
+    other_choice = len(suggested_industries) + 1
+    print(f"{other_choice}. Other (specify)")
     
     while True:
         try:
-            choice = int(input("Enter your choice (1-4): "))
-            if 1 <= choice <= 3:
+            choice = int(input(f"Enter your choice (1-{other_choice}): "))
+            if 1 <= choice < other_choice:
                 selected_industry = suggested_industries[choice-1]
                 break
-            elif choice == 4:
+            elif choice == other_choice:
                 selected_industry = input("Please specify the industry: ")
                 break
             else:
-                print("Invalid choice. Please enter a number between 1 and 4.")
+                print(f"Invalid choice. Please enter a number between 1 and {other_choice}.")
         except ValueError:
             print("Please enter a valid number.")
     
-    job_details = {
-        'company_name': company_name,
-        'job_title': input("Job title: "),
-        'job_description': input("Key requirements from job description (comma separated): "),
-        'your_name': input("Your name: "),
-        'industry': selected_industry,
-        'email': input("Your email address: "),
-        'phone': input("Your phone number: "),
-        'city': input("Your city: "),
-        'country': input("Your country: ")
-    }
+    job_details['industry'] = selected_industry
     
     return job_details
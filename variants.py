@@ -0,0 +1,141 @@
+import json
+import re
+
+from cache import get_response_cache, make_cache_key
+from generate_CL import budgeted_prompt, build_prompt, config
+from model_pool import generate_content, get_backend
+from prompt_budget import STOPWORDS, split_requirements
+from usage import template_label, usage_labels
+
+# Length the free-writing prompt asks for
+TARGET_WORDS = 500
+
+VARIANT_SEPARATOR = "=== VARIANT ==="
+
+# Leftover template markers: [Placeholder], {placeholder}, ___ or XXX
+_PLACEHOLDER_PATTERN = re.compile(r"\[[^\[\]\n]{1,60}\]|\{[^{}\n]{1,60}\}|_{3,}|\bX{3,}\b")
+_WORD_PATTERN = re.compile(r"[a-z0-9+#]+")
+
+
+def _content_words(text):
+    # Stopwords would match any letter and count every requirement as covered
+    return {word for word in _WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS}
+
+
+def score_letter(cover_letter, job_details, target_words=TARGET_WORDS):
+    """
+    Score a letter with cheap local heuristics; higher is better.
+
+    The score adds closeness of the word count to target_words (0-1) and the
+    share of job_description requirements the letter mentions (0-1), and
+    subtracts 0.25 for every leftover placeholder.
+
+    Args:
+        cover_letter (str): The letter to score
+        job_details (dict): Dictionary containing job details like company, role, etc.
+        target_words (int): The intended letter length in words
+
+    Returns:
+        float: The score
+    """
+    words = len(cover_letter.split())
+    closeness = max(0.0, 1 - abs(words - target_words) / target_words)
+
+    placeholders = len(_PLACEHOLDER_PATTERN.findall(cover_letter))
+
+    letter_words = _content_words(cover_letter)
+    requirements = split_requirements(job_details.get('job_description', ''))
+    covered = sum(1 for requirement in requirements if _content_words(requirement) & letter_words)
+    coverage = covered / len(requirements) if requirements else 1.0
+
+    return closeness + coverage - 0.25 * placeholders
+
+
+def rank_variants(variants, job_details, target_words=TARGET_WORDS):
+    """Return the variants sorted best first by score_letter()"""
+    return sorted(variants, key=lambda letter: score_letter(letter, job_details, target_words), reverse=True)
+
+
+def _candidate_texts(response):
+    """Extract the text of every candidate in an SDK response"""
+    candidates = getattr(response, "candidates", None)
+    if not candidates:
+        return [response.text]
+    texts = []
+    for candidate in candidates:
+        text = "".join(getattr(part, "text", "") for part in candidate.content.parts)
+        if text.strip():
+            texts.append(text)
+    return texts
+
+
+def _structured_variants(prompt, count, model_name):
+    """Ask for all variants in one answer, separated by VARIANT_SEPARATOR"""
+    structured_prompt = (
+        f"{prompt}\n\nWrite {count} different versions of this cover letter, each with a distinct style "
+        f"(for example formal, warm, concise). Put a line containing only {VARIANT_SEPARATOR} before each version."
+    )
+    response = generate_content(structured_prompt, model_name)
+    return [part.strip() for part in response.text.split(VARIANT_SEPARATOR) if part.strip()]
+
+
+def generate_variants(template, job_details, count=3, rank=True, use_cache=True, refresh=False):
+    """
+    Generate several alternative cover letters for one posting in a single model call.
+
+    Asks for count candidates in one request. If the model returns fewer, the
+    missing variants are requested in one structured prompt; if the model
+    rejects candidate_count, all of them are.
+
+    Args:
+        template (str): The cover letter template with placeholders, or None to write the letter freely
+        job_details (dict): Dictionary containing job details like company, role, etc.
+        count (int): Number of variants to generate
+        rank (bool): Sort the variants best first with score_letter()
+        use_cache (bool): Look up and store the variants in the on-disk response cache
+        refresh (bool): Skip the cache lookup and overwrite the cached variants
+
+    Returns:
+        list: The generated cover letters
+    """
+    model_name = config["DEFAULT_MODEL"]
+    prompt = budgeted_prompt(lambda details: build_prompt(template, details), job_details)
+
+    cache = get_response_cache(config) if use_cache else None
+    cache_key = make_cache_key(f"{prompt}\0variants={count}", model_name, get_backend().name)
+    variants = None
+    if cache is not None and not refresh:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            variants = json.loads(cached)
+
+    if variants is None:
+        with usage_labels(template=template_label(template), operation="variants"):
+            variants = _generate_variants(prompt, count, model_name)
+        if cache is not None:
+            cache.put(cache_key, model_name, json.dumps(variants))
+
+    if rank:
+        variants = rank_variants(variants, job_details)
+    return variants
+
+
+def _rejects_candidate_count(error):
+    """True if the API refused the request as invalid, as models without multi-candidate support do"""
+    return getattr(error, "code", None) == 400 or type(error).__name__ in ("InvalidArgument", "BadRequest")
+
+
+def _generate_variants(prompt, count, model_name):
+    try:
+        response = generate_content(prompt, model_name, {"candidate_count": count})
+        variants = _candidate_texts(response)
+    except Exception as e:
+        # Budget, deadline and server errors are not a reason to send a second full-price request
+        if not _rejects_candidate_count(e):
+            raise
+        print(f"Multi-candidate request rejected ({e}), asking for all variants in one prompt instead.")
+        variants = []
+    if len(variants) < count:
+        # Candidates already returned were paid for, so only the missing ones are requested
+        variants += _structured_variants(prompt, count - len(variants), model_name)
+    return variants[:count]